@@ -1,4 +1,3 @@
-from django.http import JsonResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, OpenApiExample, extend_schema
 from rest_framework import status
@@ -6,6 +5,7 @@ from rest_framework.decorators import api_view
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from client_space.serializers.auth import CustomTokenObtainPairSerializer
+from xside_server.responses import JsonResponse
 
 
 class EmailTokenObtainPairView(TokenObtainPairView):
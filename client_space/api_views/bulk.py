@@ -0,0 +1,185 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiExample
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.api_views.item import parse_item
+from client_space.item_index import active_item_index
+from client_space.manifest import update_manifest
+from client_space.models import Client, Item
+from client_space.tiles import invalidate_tiles
+from logger.spend import spend_tracker
+from xside_server.responses import JsonResponse
+
+MAX_BULK_SIZE = 1000
+# fields written for existing items
+UPDATE_FIELDS = ['areas', 'is_active', 'max_rate', 'max_daily_spend', 'updated_at']
+
+
+def _items_changed(item_ids, activated_ids):
+    """
+    Bulk operations don't send model signals, refresh in-process caches and the manifest of the items
+    :param item_ids: ids of changed items
+    :param activated_ids: ids of items activated or deactivated, only they change the manifest
+    """
+    for item_id in item_ids:
+        active_item_index.invalidate(item_id)
+        spend_tracker.forget(item_id)
+    invalidate_tiles()
+    update_manifest(activated_ids)
+
+
+@extend_schema(
+    operation_id='Create or update items',
+    description='Create or update items by client and name in one transaction. '
+                'Nothing is saved if any of the items is not valid',
+    methods=["POST", ],
+    request=OpenApiTypes.OBJECT,
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Request',
+            value={
+                "items": [
+                    {
+                        "client": "Client1",
+                        "name": "Item1",
+                        "areas": {"type": "MultiPolygon",
+                                  "coordinates": [[[[37.602, 55.753], [37.601, 55.750], [37.609, 55.749], [37.602, 55.753]]]]},
+                        "is_active": True,
+                        "max_rate": 10.0,
+                        "max_daily_spend": 100.0
+                    },
+                ]
+            },
+            request_only=True,
+        ),
+        OpenApiExample(
+            'Example',
+            value={"data": [{"index": 0, "id": 49, "client": "Client1", "name": "Item1", "status": "created"}]},
+            response_only=True,
+        ),
+        OpenApiExample(
+            'Errors',
+            value={"errors": [{"index": 0, "errors": [{"max_rate": "Cannot parse max_rate. Expected decimal number"}]}]},
+            response_only=True,
+        ),
+    ],
+)
+@api_view(['POST', ])
+def items_bulk(request):
+    """
+    Create or update items
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    entries = request.data.get("items") if isinstance(request.data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return JsonResponse({"errors": [{"items": "Expected non-empty list of items"}]}, status=status.HTTP_400_BAD_REQUEST)
+    if len(entries) > MAX_BULK_SIZE:
+        return JsonResponse({"errors": [{"items": f"Expected at most {MAX_BULK_SIZE} items"}]}, status=status.HTTP_400_BAD_REQUEST)
+
+    clients = {client.name: client for client in Client.objects.filter(clientuser__user=request.user)}
+    parsed, errors, keys = [], [], set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors.append({"index": index, "errors": [{"item": "Expected object"}]})
+            continue
+        areas, client, is_active, max_daily_spend, max_rate, name, entry_errors = parse_item(entry, clients)
+        if not entry_errors:
+            if (client.pk, name) in keys:
+                entry_errors.append({"name": "Item is repeated in the request"})
+            keys.add((client.pk, name))
+        if entry_errors:
+            errors.append({"index": index, "errors": entry_errors})
+            continue
+        parsed.append((index, Item(client=client, name=name, areas=areas, is_active=is_active,
+                                   max_rate=max_rate, max_daily_spend=max_daily_spend)))
+    if errors:
+        return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    existing = Item.objects.filter(client__in={item.client for _, item in parsed}, name__in={item.name for _, item in parsed})
+    existing = {(item.client_id, item.name): item for item in existing}
+    created, updated, results = [], [], []
+    now = timezone.now()
+    for index, item in parsed:
+        current = existing.get((item.client.pk, item.name))
+        if current is None:
+            created.append(item)
+        else:
+            item.pk = current.pk
+            item.updated_at = now
+            updated.append(item)
+        results.append((index, item, "created" if current is None else "updated"))
+
+    try:
+        with transaction.atomic():
+            Item.objects.bulk_create(created)
+            Item.objects.bulk_update(updated, UPDATE_FIELDS)
+    except IntegrityError:
+        return JsonResponse({"errors": [{"Item": "Item already exists"}]}, status=status.HTTP_409_CONFLICT)
+
+    activated = [item.pk for item in updated if item.is_active != existing[(item.client.pk, item.name)].is_active]
+    _items_changed([item.pk for _, item, _ in results], activated)
+    data = [{"index": index, "id": item.pk, "client": item.client.name, "name": item.name, "status": result}
+            for index, item, result in results]
+    return JsonResponse({"data": data}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    operation_id='Activate or deactivate items',
+    description='Set is_active of items by ids',
+    methods=["POST", ],
+    request=OpenApiTypes.OBJECT,
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Request',
+            value={"ids": [46, 49, 50], "is_active": False},
+            request_only=True,
+        ),
+        OpenApiExample(
+            'Example',
+            value={"data": {"updated": [46, 49], "not_found": [50]}},
+            response_only=True,
+        ),
+    ],
+)
+@api_view(['POST', ])
+def items_bulk_active(request):
+    """
+    Set is_active of items
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    errors = []
+    ids = request.data.get("ids") if isinstance(request.data, dict) else None
+    if not isinstance(ids, list) or not ids or not all(isinstance(item_id, int) for item_id in ids):
+        errors.append({"ids": "Expected non-empty list of item ids"})
+    elif len(ids) > MAX_BULK_SIZE:
+        errors.append({"ids": f"Expected at most {MAX_BULK_SIZE} ids"})
+    is_active = request.data.get("is_active") if isinstance(request.data, dict) else None
+    if not isinstance(is_active, bool):
+        errors.append({'is_active': 'Cannot parse is_active. Expected value: true or false'})
+    if errors:
+        return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    items = Item.objects.filter(pk__in=ids, client__clientuser__user=request.user)
+    with transaction.atomic():
+        current = dict(items.select_for_update(of=('self',)).values_list('pk', 'is_active'))
+        updated = sorted(current)
+        Item.objects.filter(pk__in=updated).update(is_active=is_active, updated_at=timezone.now())
+
+    _items_changed(updated, [item_id for item_id in updated if current[item_id] != is_active])
+    not_found = sorted(set(ids) - set(updated))
+    return JsonResponse({"data": {"updated": updated, "not_found": not_found}}, status=status.HTTP_200_OK)
@@ -2,14 +2,18 @@ import json
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.forms.models import model_to_dict
-from django.http import JsonResponse
 from django.shortcuts import HttpResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import status
 from rest_framework.decorators import api_view
 
+from client_space.api_views.conditional import make_etag, not_modified
+from client_space.api_views.pagination import paginate
 from client_space.models import Client, ClientUser
+from xside_server.responses import JsonResponse
+
+DEFAULT_PAGE_SIZE = 10
 
 
 def serialize_client(client):
@@ -24,6 +28,10 @@ def serialize_client(client):
     parameters=[
         OpenApiParameter("page_size", OpenApiTypes.INT, description="Page size"),
         OpenApiParameter("page", OpenApiTypes.INT, description="Page number"),
+        OpenApiParameter("cursor", OpenApiTypes.STR,
+                         description="Cursor from the next field of the previous page, empty for the first page. "
+                                     "Switches to cursor pagination"),
+        OpenApiParameter("with_count", OpenApiTypes.BOOL, description="Return count in cursor pagination"),
     ],
     methods=["GET", ],
     responses={
@@ -38,14 +46,19 @@ def clients(request):
     if request.method == "GET":
         clients_data = Client.objects.filter(clientuser__user=request.user)
 
-        clients_count = clients_data.count()
+        clients_data, page, errors = paginate(request, clients_data, DEFAULT_PAGE_SIZE)
+        if errors:
+            return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
 
-        page_size = int(request.GET.get("page_size", "10"))
-        page_no = int(request.GET.get("page", "0"))
-        clients_data = list(clients_data[page_no * page_size:page_no * page_size + page_size])
+        etag = make_etag(page, [(client.pk, client.name) for client in clients_data])
+        response = not_modified(request, etag)
+        if response:
+            return response
 
         clients_data = [serialize_client(client) for client in clients_data]
-        return JsonResponse({"count": clients_count, "data": clients_data}, status=status.HTTP_200_OK)
+        response = JsonResponse({**page, "data": clients_data}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     return JsonResponse({"detail": "Wrong method"}, status=status.HTTP_501_NOT_IMPLEMENTED)
 
@@ -76,6 +89,12 @@ def client(request, client_id):
         return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
-        return JsonResponse({"data": serialize_client(client)}, status=status.HTTP_200_OK)
+        etag = make_etag(client.pk, client.name)
+        response = not_modified(request, etag)
+        if response:
+            return response
+        response = JsonResponse({"data": serialize_client(client)}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     return JsonResponse({"detail": "Wrong method"}, status=status.HTTP_501_NOT_IMPLEMENTED)
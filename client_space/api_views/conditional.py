@@ -0,0 +1,23 @@
+import hashlib
+import json
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag of the parts describing the version of a resource"""
+    return '"%s"' % hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def not_modified(request, etag: str):
+    """
+    Check If-None-Match of the request
+    :return: 304 response if the client has the etag, None otherwise
+    """
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in etags or etag in etags:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return None
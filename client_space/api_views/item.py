@@ -1,42 +1,149 @@
 import decimal
 import json
-from hashlib import md5
+import math
 
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
 from django.contrib.gis.gdal import GDALException
 from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
-from django.forms.models import model_to_dict
-from django.http import JsonResponse
+from django.db.models import Prefetch
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from rest_framework import status
 from rest_framework.decorators import api_view
 
+from client_space.api_views.conditional import make_etag, not_modified
+from client_space.api_views.pagination import paginate
+from client_space.media import media_urls, url_version
 from client_space.models import Item, Client, ItemFile
+from client_space.uploads import file_md5
+from xside_server.responses import JsonResponse, RawJSON
 
 MAX_PAGE_SIZE = 100
+MAX_PRECISION = 15
 
 
 class ParsingError(Exception):
     pass
 
 
-def serialize_item(item, fields=None):
-    serialized = model_to_dict(item)
-    out = {
-        "name": str(item.name),
-        "client": item.client.name,
-        "images": list(ItemFile.objects.filter(item=item).values_list("image", flat=1)),
-        "images_url": [i.image.url for i in ItemFile.objects.filter(item=item)],
-        "areas": json.loads(item.areas.geojson),
-        "max_rate": float(item.max_rate),
-        "max_daily_spend": float(item.max_daily_spend)
-    }
-    serialized.update(out)
-    if fields:
-        serialized = {field: serialized.get(field, None) for field in fields}
-    return serialized
+# serializers of item fields, in the order of the output
+ITEM_FIELDS = {
+    "id": lambda item: item.pk,
+    "client": lambda item: item.client.name,
+    "name": lambda item: str(item.name),
+    "areas": lambda item: serialize_areas(item),
+    "is_active": lambda item: item.is_active,
+    "max_rate": lambda item: float(item.max_rate),
+    "max_daily_spend": lambda item: float(item.max_daily_spend),
+    "images": lambda item: [i.image.name for i in item.items.all()],
+    "images_url": lambda item: media_urls([i.image.name for i in item.items.all()]),
+}
+# item fields stored in the item table
+ITEM_COLUMNS = {"name", "areas", "is_active", "max_rate", "max_daily_spend"}
+# item fields taken from item files
+ITEM_FILE_FIELDS = {"images", "images_url"}
+
+
+def item_queryset(queryset, fields=None, areas_options=None):
+    """
+    Load only the columns and relations needed to serialize the fields
+    :param queryset: Item queryset
+    :param fields: list of fields to serialize, all fields by default
+    :param areas_options: simplify and precision of areas, see serialize_areas
+    :return: queryset
+    """
+    fields = set(fields or ITEM_FIELDS)
+    columns = ['id'] + sorted(ITEM_COLUMNS & fields)
+    if 'areas' in fields:
+        # version of simplified areas in the cache
+        columns.append('updated_at')
+        if not areas_options:
+            # GeoJSON rendered by PostGIS is put into the response as is
+            columns.remove('areas')
+            queryset = queryset.annotate(areas_geojson=AsGeoJSON('areas', precision=MAX_PRECISION))
+    if 'client' in fields:
+        queryset = queryset.select_related('client')
+        columns += ['client', 'client__name']
+    queryset = queryset.only(*columns)
+    if ITEM_FILE_FIELDS & fields:
+        queryset = queryset.prefetch_related(Prefetch('items', queryset=ItemFile.objects.only('id', 'item', 'image')))
+    return queryset
+
+
+def serialize_item(item, fields=None, areas_options=None):
+    """
+    Serialize item, unknown fields are returned as None.
+    Only requested fields are computed, so the item can be loaded with item_queryset
+    :param areas_options: simplify and precision of areas, see serialize_areas
+    """
+    fields = fields or ITEM_FIELDS
+    serializers = ITEM_FIELDS
+    if areas_options:
+        serializers = dict(ITEM_FIELDS, areas=lambda item: serialize_areas(item, **areas_options))
+    return {field: serializers[field](item) if field in serializers else None for field in fields}
+
+
+def serialize_areas(item, simplify: float = None, precision: int = None):
+    """
+    Item areas in GeoJSON format, RawJSON unless simplified or rounded.
+    Simplified or rounded areas are cached per item version
+    :param simplify: simplification tolerance in degrees
+    :param precision: number of decimal places of coordinates
+    :return:
+    """
+    if not simplify and precision is None:
+        return RawJSON(getattr(item, 'areas_geojson', None) or item.areas.geojson)
+
+    key = f'item_areas:{item.pk}:{item.updated_at.timestamp()}:{simplify}:{precision}'
+    areas = cache.get(key)
+    if areas is None:
+        geometry = item.areas.simplify(simplify, preserve_topology=True) if simplify else item.areas
+        areas = json.loads(geometry.geojson)
+        if precision is not None:
+            areas["coordinates"] = _round_coordinates(areas["coordinates"], precision)
+        cache.set(key, areas, settings.AREAS_CACHE_TIMEOUT)
+    return areas
+
+
+def _round_coordinates(coordinates, precision):
+    """Round GeoJSON coordinates dropping positions repeated after rounding"""
+    if not coordinates:
+        return coordinates
+    if isinstance(coordinates[0], (int, float)):
+        return [round(c, precision) for c in coordinates]
+    rounded = [_round_coordinates(c, precision) for c in coordinates]
+    if rounded[0] and isinstance(rounded[0][0], (int, float)):
+        ring = [position for i, position in enumerate(rounded) if i == 0 or position != rounded[i - 1]]
+        if len(ring) >= 4:
+            rounded = ring
+    return rounded
+
+
+def _parse_areas_options(request):
+    """
+    Parse simplify and precision query parameters
+    :return: options for serialize_areas, errors
+    """
+    options, errors = {}, []
+    if "simplify" in request.GET:
+        try:
+            options["simplify"] = float(request.GET["simplify"])
+            if not math.isfinite(options["simplify"]) or options["simplify"] < 0:
+                raise ValueError('simplify must be a non-negative number')
+        except ValueError:
+            errors.append({"simplify": "Expected non-negative number, tolerance in degrees"})
+    if "precision" in request.GET:
+        try:
+            options["precision"] = int(request.GET["precision"])
+            if not 0 <= options["precision"] <= MAX_PRECISION:
+                raise ValueError('precision out of range')
+        except ValueError:
+            errors.append({"precision": f"Expected integer from 0 to {MAX_PRECISION}"})
+    return options, errors
 
 
 @extend_schema(
@@ -60,6 +167,12 @@ def serialize_item(item, fields=None):
                          ]),
         OpenApiParameter("page_size", OpenApiTypes.INT, description="Page size"),
         OpenApiParameter("page", OpenApiTypes.INT, description="Page number"),
+        OpenApiParameter("cursor", OpenApiTypes.STR,
+                         description="Cursor from the next field of the previous page, empty for the first page. "
+                                     "Switches to cursor pagination"),
+        OpenApiParameter("with_count", OpenApiTypes.BOOL, description="Return count in cursor pagination"),
+        OpenApiParameter("simplify", OpenApiTypes.FLOAT, description="Simplification tolerance of areas in degrees"),
+        OpenApiParameter("precision", OpenApiTypes.INT, description="Number of decimal places of areas coordinates"),
     ],
     methods=["GET", ],
     responses={
@@ -244,17 +357,30 @@ def items(request):
 
     if request.method in ("GET", 'HEAD'):
         clients = Client.objects.filter(clientuser__user=request.user)
-        items_data = Item.objects.filter(client__in=clients)
-
-        items_count = items_data.count()
-
-        page_size = min(MAX_PAGE_SIZE, int(request.GET.get("page_size", MAX_PAGE_SIZE)))
-        page_no = int(request.GET.get("page", "0"))
-        items_data = list(items_data[page_no * page_size:page_no * page_size + page_size])
         fields = request.GET.getlist("fields", [])
-        items_data = [serialize_item(item, fields) for item in items_data]
-
-        return JsonResponse({"count": items_count, "data": items_data}, status=status.HTTP_200_OK)
+        areas_options, errors = _parse_areas_options(request)
+        if errors:
+            return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        # page versions first, items are loaded and serialized only if the client doesn't have the page
+        versions = Item.objects.filter(client__in=clients).select_related('client').only('id', 'updated_at', 'client', 'client__name')
+        versions, page, errors = paginate(request, versions, MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        if errors:
+            return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # signed URLs of item files expire, pages with them change with the URLs
+        urls_version = url_version() if 'images_url' in (fields or ITEM_FIELDS) else None
+        etag = make_etag(page, fields, areas_options, urls_version,
+                         [(item.pk, item.updated_at, item.client.name) for item in versions])
+        response = not_modified(request, etag)
+        if response:
+            return response
+
+        items_data = item_queryset(Item.objects.filter(pk__in=[item.pk for item in versions]), fields, areas_options).in_bulk()
+        items_data = [serialize_item(items_data[item.pk], fields, areas_options) for item in versions if item.pk in items_data]
+
+        response = JsonResponse({**page, "data": items_data}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     if request.method == "POST":
         item = Item()
@@ -266,7 +392,10 @@ def items(request):
 @extend_schema(
     operation_id='Get item by id',
     description='Get item by id',
-    parameters=[],
+    parameters=[
+        OpenApiParameter("simplify", OpenApiTypes.FLOAT, description="Simplification tolerance of areas in degrees"),
+        OpenApiParameter("precision", OpenApiTypes.INT, description="Number of decimal places of areas coordinates"),
+    ],
     methods=["GET", ],
     responses={
         (200, 'application/json'): OpenApiTypes.OBJECT
@@ -440,7 +569,7 @@ def item(request, item_id):
         return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
     try:
-        item = Item.objects.get(pk=item_id)
+        item = Item.objects.select_related('client').get(pk=item_id)
     except ObjectDoesNotExist:
         return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -449,7 +578,16 @@ def item(request, item_id):
         return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
     if request.method == "GET":
-        return JsonResponse({"data": serialize_item(item)}, status=status.HTTP_200_OK)
+        areas_options, errors = _parse_areas_options(request)
+        if errors:
+            return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        etag = make_etag(item.pk, item.updated_at, item.client.name, areas_options, url_version())
+        response = not_modified(request, etag)
+        if response:
+            return response
+        response = JsonResponse({"data": serialize_item(item, areas_options=areas_options)}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     if request.method == "PUT":
         return save_item(request, item, status.HTTP_200_OK)
@@ -645,9 +783,8 @@ def image(request, item_id):
 
 
 def _get_md5(file):
-    result = md5(file.read()).hexdigest()
-    file.seek(0)
-    return result
+    """Md5 of an uploaded file, computed by the upload handlers if they are used"""
+    return getattr(file, 'md5', None) or file_md5(file)
 
 
 def save_item(request, item, success_status):
@@ -680,27 +817,39 @@ def _parse_request_body(request):
     :param request:
     :return:
     """
+    clients = Client.objects.filter(name=request.data.get("client", ""), clientuser__user=request.user)
+    return parse_item(request.data, {client.name: client for client in clients})
+
+
+def parse_item(data, clients):
+    """
+    Parse item fields
+    :param data: dict of item fields
+    :param clients: dict of clients available to the user by name
+    :return: areas, client, is_active, max_daily_spend, max_rate, name, errors
+    """
     errors = []
-    client = request.data.get("client", "")
+    client = data.get("client", "")
     if client == "":
         errors.append({"client": "This field is required"})
-    try:
-        client = Client.objects.get(name=client, clientuser__user=request.user)
-    except Client.DoesNotExist:
+    client = clients.get(client) if isinstance(client, str) else None
+    if client is None:
         errors.append({"client": "Client not found or user doesn't have access to this manage this client"})
-    name = request.data.get("name", "")
+    name = data.get("name", "")
     if name == "":
         errors.append({"name": "This field is required"})
-    areas = request.data.get("areas", "")
+    areas = data.get("areas", "")
     if name == "":
         errors.append({"areas": "This field is required"})
     try:
+        if isinstance(areas, dict):
+            areas = json.dumps(areas)
         areas = GEOSGeometry(areas)
         if areas.geom_type != 'MultiPolygon':
             raise GDALException(f'Expected MultiPolygon, got {areas.geom_type}')
-    except (GDALException, ValueError):
+    except (GDALException, TypeError, ValueError):
         errors.append({"areas": "Incorrect format of the field. Expected MultiPolygon in GeoJSON format."})
-    is_active = str(request.data.get("is_active", Item._meta.get_field('is_active').get_default()))
+    is_active = str(data.get("is_active", Item._meta.get_field('is_active').get_default()))
     try:
         if is_active.lower() in ('true', 'false'):
             is_active = is_active.lower() == 'true'
@@ -708,14 +857,14 @@ def _parse_request_body(request):
             raise ParsingError('Cannot parse is_active field')
     except ParsingError:
         errors.append({'is_active': 'Cannot parse is_active. Expected value: true or false'})
-    max_rate = request.data.get("max_rate", Item._meta.get_field('max_rate').get_default())
+    max_rate = data.get("max_rate", Item._meta.get_field('max_rate').get_default())
     try:
         max_rate = round(decimal.Decimal(max_rate), Item._meta.get_field('max_daily_spend').decimal_places)
         if max_rate <= 0:
             errors.append({'max_rate': 'Max_rate cannot be negative or zero. Expected positive number'})
     except Exception:
         errors.append({'max_rate': 'Cannot parse max_rate. Expected decimal number'})
-    max_daily_spend = request.data.get("max_daily_spend", Item._meta.get_field('max_daily_spend').get_default())
+    max_daily_spend = data.get("max_daily_spend", Item._meta.get_field('max_daily_spend').get_default())
     try:
         max_daily_spend = round(decimal.Decimal(max_daily_spend), Item._meta.get_field('max_daily_spend').decimal_places)
 
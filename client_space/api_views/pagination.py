@@ -0,0 +1,74 @@
+import base64
+import binascii
+
+CURSOR_PARAMETER = "cursor"
+
+
+def encode_cursor(pk: int) -> str:
+    """Opaque cursor pointing after the object with the primary key"""
+    return base64.urlsafe_b64encode(str(pk).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Primary key from the cursor, raises ValueError on a malformed cursor"""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(str(e))
+
+
+def paginate(request, queryset, default_page_size: int, max_page_size: int = None):
+    """
+    Paginate queryset by page number (page, page_size) or, when the cursor parameter is given,
+    by primary key (cursor, page_size, with_count). The first cursor page is requested with an empty cursor.
+    :param request:
+    :param queryset:
+    :param default_page_size:
+    :param max_page_size: upper bound of page_size if any
+    :return: objects of the page, dict to add to the response (count, next), errors
+    """
+    errors = []
+    try:
+        page_size = int(request.GET.get("page_size", default_page_size))
+        if page_size < 1:
+            raise ValueError('page_size must be positive')
+        if max_page_size:
+            page_size = min(max_page_size, page_size)
+    except ValueError:
+        page_size = default_page_size
+        errors.append({"page_size": "Expected positive integer"})
+
+    if CURSOR_PARAMETER not in request.GET:
+        try:
+            page_no = int(request.GET.get("page", "0"))
+            if page_no < 0:
+                raise ValueError('page must not be negative')
+        except ValueError:
+            return [], {}, errors + [{"page": "Expected non-negative integer"}]
+        if errors:
+            return [], {}, errors
+        count = queryset.count()
+        return list(queryset[page_no * page_size:page_no * page_size + page_size]), {"count": count}, []
+
+    cursor = request.GET.get(CURSOR_PARAMETER)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            errors.append({"cursor": "Invalid cursor"})
+    if errors:
+        return [], {}, errors
+
+    meta = {}
+    if request.GET.get("with_count", "false").lower() == "true":
+        meta["count"] = queryset.count()
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    objects = list(queryset.order_by('pk')[:page_size + 1])
+    if len(objects) > page_size:
+        objects = objects[:page_size]
+        meta["next"] = encode_cursor(objects[-1].pk)
+    else:
+        meta["next"] = None
+    return objects, meta, []
@@ -0,0 +1,108 @@
+import datetime
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.models import Item
+from logger.models import ItemHourlyShows
+from xside_server.responses import JsonResponse
+
+DEFAULT_STATS_DAYS = 30
+
+
+def _parse_day(value: str, default: datetime.date) -> datetime.date:
+    """Parse date YYYY-MM-DD, default if the value is not given, ValueError if it is malformed"""
+    if not value:
+        return default
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'{value} is not a date')
+    return day
+
+
+@extend_schema(
+    operation_id='Get item stats',
+    description='Get number of item shows per hour or per day',
+    parameters=[
+        OpenApiParameter("start", OpenApiTypes.DATE, description="First day, 30 days ago by default"),
+        OpenApiParameter("end", OpenApiTypes.DATE, description="Last day, today by default"),
+        OpenApiParameter("granularity", OpenApiTypes.STR, description="hour or day", enum=['hour', 'day']),
+    ],
+    methods=["GET", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Example',
+            value={
+                "total": 345,
+                "data": [
+                    {"time": "2022-01-08", "shows": 120},
+                    {"time": "2022-01-09", "shows": 225},
+                ]
+            }
+        ),
+    ],
+)
+@api_view(['GET', ])
+def item_stats(request, item_id):
+    """
+    Get item shows from the rollups
+    :param item_id:
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        item = Item.objects.get(pk=item_id)
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # check user permissions to access this item
+    if not item.client.clientuser_set.filter(user=request.user):
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    errors = []
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    try:
+        end = _parse_day(request.GET.get("end"), today)
+    except ValueError:
+        end = today
+        errors.append({"end": "Cannot parse end. Expected date YYYY-MM-DD"})
+    try:
+        start = _parse_day(request.GET.get("start"), end - datetime.timedelta(days=DEFAULT_STATS_DAYS))
+    except ValueError:
+        errors.append({"start": "Cannot parse start. Expected date YYYY-MM-DD"})
+    else:
+        if start > end:
+            errors.append({"start": "Expected start not after end"})
+    granularity = request.GET.get("granularity", "day")
+    if granularity not in ("hour", "day"):
+        errors.append({"granularity": "Expected hour or day"})
+    if errors:
+        return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    shows = ItemHourlyShows.objects.filter(
+        item=item,
+        hour__gte=datetime.datetime(start.year, start.month, start.day, tzinfo=datetime.timezone.utc),
+        hour__lt=datetime.datetime(end.year, end.month, end.day, tzinfo=datetime.timezone.utc) + datetime.timedelta(days=1),
+    )
+    if granularity == "day":
+        shows = (shows.annotate(time=TruncDate('hour', tzinfo=datetime.timezone.utc))
+                 .values('time')
+                 .annotate(count=Sum('shows'))
+                 .order_by('time')
+                 .values_list('time', 'count'))
+    else:
+        shows = shows.order_by('hour').values_list('hour', 'shows')
+
+    data = [{"time": time.isoformat(), "shows": count} for time, count in shows]
+    return JsonResponse({"total": sum(row["shows"] for row in data), "data": data}, status=status.HTTP_200_OK)
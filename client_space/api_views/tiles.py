@@ -0,0 +1,71 @@
+from django.db import connection
+from django.http import HttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.models import Client, Item
+from client_space.tiles import get_tile, set_tile, tile_generation
+from xside_server.responses import JsonResponse
+
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_LAYER = 'items'
+MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+
+def _render_tile(client_ids, z: int, x: int, y: int) -> bytes:
+    """Render items of the clients intersecting the tile with ST_AsMVT"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom), '
+            f'features AS ('
+            f'SELECT i.id, i.name, c.name AS client, i.is_active, '
+            f'ST_AsMVTGeom(ST_Transform(i.areas, 3857), bounds.geom, %s, %s, true) AS geom '
+            f'FROM {Item._meta.db_table} i JOIN {Client._meta.db_table} c ON c.id = i.client_id, bounds '
+            f'WHERE i.client_id = ANY(%s) AND ST_Intersects(i.areas, ST_Transform(bounds.geom, 4326))'
+            f') '
+            f'SELECT ST_AsMVT(features, %s, %s, \'geom\') FROM features WHERE geom IS NOT NULL',
+            [z, x, y, TILE_EXTENT, TILE_BUFFER, list(client_ids), TILE_LAYER, TILE_EXTENT]
+        )
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b''
+
+
+@extend_schema(
+    operation_id='Get items tile',
+    description='Get areas of items available for the user as Mapbox Vector Tile. '
+                'Layer "items" has id, name, client and is_active properties',
+    parameters=[],
+    methods=["GET", ],
+    responses={
+        (200, MVT_CONTENT_TYPE): OpenApiTypes.BINARY
+    },
+)
+@api_view(['GET', ])
+def tile(request, z, x, y):
+    """
+    Get vector tile of items areas
+    :param z: zoom
+    :param x: tile column
+    :param y: tile row
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return JsonResponse({"detail": "Tile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    client_ids = list(Client.objects.filter(clientuser__user=request.user).values_list('pk', flat=True))
+    generation = tile_generation()
+    data = get_tile(generation, client_ids, z, x, y)
+    if data is None:
+        data = _render_tile(client_ids, z, x, y) if client_ids else b''
+        set_tile(generation, client_ids, z, x, y, data)
+
+    if not data:
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+    return HttpResponse(data, content_type=MVT_CONTENT_TYPE)
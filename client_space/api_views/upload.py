@@ -0,0 +1,287 @@
+import hashlib
+import io
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.api_views.item import serialize_item
+from client_space.blobs import lock_stored_file
+from client_space.models import Item, ItemFile, UploadSession, item_file_path
+from client_space.uploads import READ_SIZE, DigestState, get_upload, read_part, staging_name, start_upload
+from xside_server.responses import JsonResponse
+
+MD5_RE = re.compile('[0-9a-f]{32}')
+
+
+def serialize_upload(session):
+    return {
+        "id": session.pk,
+        "path": session.path,
+        "size": session.size,
+        "received": session.received,
+        "chunk_size": session.chunk_size,
+    }
+
+
+def _get_item(request, item_id):
+    """
+    Get item available to the user
+    :return: item, error response
+    """
+    if request.user.is_anonymous:
+        return None, JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        item = Item.objects.select_related('client').get(pk=item_id)
+    except ObjectDoesNotExist:
+        return None, JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # check user permissions to access this item
+    if not item.client.clientuser_set.filter(user=request.user):
+        return None, JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    return item, None
+
+
+def _add_stored_file(item, file_md5: str, file_sha256: str = None) -> bool:
+    """
+    Add already stored file to the item, must be called in a transaction.
+    Md5 is given by the client, so only files of the same client are looked up by it.
+    Files of other clients are shared only by sha256 computed by the server
+    :param item: Item
+    :param file_md5: md5 of the file
+    :param file_sha256: sha256 of the file computed by the server
+    :return: True if the file is stored, False if it must be uploaded
+    """
+    if ItemFile.objects.filter(item=item, md5=file_md5).exists():
+        return True
+    if file_sha256:
+        stored = ItemFile.objects.filter(sha256=file_sha256)
+    else:
+        stored = ItemFile.objects.filter(item__client_id=item.client_id, md5=file_md5)
+    stored = stored.values_list('image', 'sha256', 'size').first()
+    if stored is None or not lock_stored_file(stored[0], ItemFile.objects.filter(image=stored[0])):
+        return False
+    ItemFile(item=item, image=stored[0], md5=file_md5, sha256=stored[1], size=stored[2]).save()
+    return True
+
+
+@extend_schema(
+    operation_id='Start item file upload',
+    description='Start chunked upload of an item file. '
+                'The file is sent by PUT requests of chunk_size bytes (the last one may be shorter) with offsets, '
+                'and the upload is finished by POST to complete. '
+                'If md5 is given and the client has the file stored already, it is added to the item without upload '
+                'and the item is returned with status 200',
+    parameters=[
+        OpenApiParameter("filename", OpenApiTypes.STR, description="File name"),
+        OpenApiParameter("size", OpenApiTypes.INT, description="File size in bytes"),
+        OpenApiParameter("md5", OpenApiTypes.STR,
+                         description="Optional file md5"),
+    ],
+    methods=["POST", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT,
+        (201, 'application/json'): OpenApiTypes.OBJECT,
+    },
+    examples=[
+        OpenApiExample(
+            'Example',
+            value={"data": {"id": 12, "path": "uploads/8c4d0c6fb2e94f7ab0ae4b1f4a3e0a57/video.mp4", "size": 20971520, "received": 0, "chunk_size": 8388608}}
+        ),
+    ],
+)
+@api_view(['POST', ])
+def uploads(request, item_id):
+    """
+    Start chunked upload of an item file
+    :param item_id:
+    :return:
+    """
+    item, response = _get_item(request, item_id)
+    if response:
+        return response
+
+    errors = []
+    filename = os.path.basename(str(request.data.get("filename", "")))
+    if not filename:
+        errors.append({"filename": "This field is required"})
+    try:
+        size = int(request.data.get("size", ""))
+        if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+            raise ValueError('size out of range')
+    except (TypeError, ValueError):
+        size = None
+        errors.append({"size": f"Expected positive integer up to {settings.UPLOAD_MAX_SIZE}"})
+    file_md5 = str(request.data.get("md5", "")).lower()
+    if file_md5 and not MD5_RE.fullmatch(file_md5):
+        errors.append({"md5": "Expected 32 hex digits"})
+    if errors:
+        return JsonResponse({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    if file_md5:
+        with transaction.atomic():
+            if _add_stored_file(item, file_md5):
+                return JsonResponse({"data": serialize_item(item)}, status=status.HTTP_200_OK)
+
+    # parts are staged under a unique name and moved to the stored file name on completion
+    path = staging_name(filename)
+    upload = start_upload(path)
+    session = UploadSession.objects.create(item=item, user=request.user, path=path, size=size, upload_id=upload.upload_id)
+    return JsonResponse({"data": serialize_upload(session)}, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    operation_id='Get item file upload',
+    description='Get state of item file upload to resume it from received bytes',
+    methods=["GET", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+)
+@extend_schema(
+    operation_id='Upload item file chunk',
+    description='Upload a chunk of an item file in the request body. '
+                'Chunks are sent in order, a chunk can be sent again with the same content to retry',
+    parameters=[
+        OpenApiParameter("offset", OpenApiTypes.INT, description="Chunk offset in the file, multiple of chunk_size"),
+    ],
+    request={'application/octet-stream': OpenApiTypes.BINARY},
+    methods=["PUT", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+)
+@extend_schema(
+    operation_id='Abort item file upload',
+    description='Abort item file upload',
+    methods=["DELETE", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+)
+@api_view(['GET', 'PUT', 'DELETE'])
+def upload(request, item_id, session_id):
+    """
+    State, chunks and abort of item file upload
+    :param item_id:
+    :param session_id:
+    :return:
+    """
+    item, response = _get_item(request, item_id)
+    if response:
+        return response
+
+    if request.method == "GET":
+        try:
+            session = UploadSession.objects.get(pk=session_id, item=item)
+        except ObjectDoesNotExist:
+            return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({"data": serialize_upload(session)}, status=status.HTTP_200_OK)
+
+    if request.method == "DELETE":
+        deleted, _ = UploadSession.objects.filter(pk=session_id, item=item).delete()
+        if not deleted:
+            return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({"detail": "deleted"}, status=status.HTTP_200_OK)
+
+    with transaction.atomic():
+        try:
+            session = UploadSession.objects.select_for_update().get(pk=session_id, item=item)
+        except ObjectDoesNotExist:
+            return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            offset = int(request.GET.get("offset", ""))
+            if offset < 0 or offset % session.chunk_size or offset >= session.size:
+                raise ValueError('offset out of range')
+        except ValueError:
+            return JsonResponse({"errors": [{"offset": f"Expected multiple of {session.chunk_size} less than file size"}]},
+                                status=status.HTTP_400_BAD_REQUEST)
+        if offset > session.received:
+            return JsonResponse({"errors": [{"offset": "Chunks are expected in order"}], "data": serialize_upload(session)},
+                                status=status.HTTP_409_CONFLICT)
+        if session.received and not session.digests:
+            # started before the digests were kept in the session
+            return JsonResponse({"errors": [{"upload": "Upload must be started again"}]}, status=status.HTTP_409_CONFLICT)
+
+        expected = min(session.chunk_size, session.size - offset)
+        part, size = read_part(request.stream or io.BytesIO(), expected)
+        with part:
+            if size != expected:
+                return JsonResponse({"errors": [{"chunk": f"Expected {expected} bytes"}]}, status=status.HTTP_400_BAD_REQUEST)
+            number = offset // session.chunk_size + 1
+            md5 = hashlib.md5()
+            digests = DigestState(session.digests)
+            for data in iter(lambda: part.read(READ_SIZE), b''):
+                md5.update(data)
+                digests.update(data)
+            part.seek(0)
+            part_md5 = md5.hexdigest()
+            if offset < session.received:
+                # the chunk is received already, it is only checked
+                received = next(p for p in session.parts if p["number"] == number)
+                if received.get("md5") != part_md5:
+                    return JsonResponse({"errors": [{"chunk": "Chunk differs from the received one"}],
+                                         "data": serialize_upload(session)}, status=status.HTTP_409_CONFLICT)
+                return JsonResponse({"data": serialize_upload(session)}, status=status.HTTP_200_OK)
+
+            etag = get_upload(session.path, session.upload_id).upload_part(number, part)
+
+        session.parts.append({"number": number, "etag": etag, "md5": part_md5})
+        session.digests = digests.state()
+        session.received = offset + size
+        session.save()
+    return JsonResponse({"data": serialize_upload(session)}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    operation_id='Complete item file upload',
+    description='Complete item file upload and add the file to the item',
+    methods=["POST", ],
+    responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT
+    },
+)
+@api_view(['POST', ])
+def complete(request, item_id, session_id):
+    """
+    Complete item file upload
+    :param item_id:
+    :param session_id:
+    :return:
+    """
+    item, response = _get_item(request, item_id)
+    if response:
+        return response
+
+    with transaction.atomic():
+        try:
+            session = UploadSession.objects.select_for_update().get(pk=session_id, item=item)
+        except ObjectDoesNotExist:
+            return JsonResponse({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.received < session.size:
+            return JsonResponse({"errors": [{"upload": "File is not uploaded completely"}], "data": serialize_upload(session)},
+                                status=status.HTTP_409_CONFLICT)
+
+        file_md5, file_sha256 = DigestState(session.digests).hexdigests()
+        upload = get_upload(session.path, session.upload_id)
+        name = item_file_path(ItemFile(item=item, sha256=file_sha256), os.path.basename(session.path))
+        # uploads of the same content wait for each other, the later ones share the stored file
+        lock_stored_file(name, ItemFile.objects.filter(image=name))
+        if _add_stored_file(item, file_md5, file_sha256):
+            # the file is stored already, only the staged parts are dropped
+            upload.abort()
+        else:
+            name = upload.complete(session.parts, name)
+            ItemFile(item=item, image=name, md5=file_md5, sha256=file_sha256, size=session.size).save()
+        session.upload_id = ''
+        session.delete()
+
+    return JsonResponse({"data": serialize_item(item)}, status=status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+"""
+Stored files shared by several rows, see client_space.models.item_file_path.
+A stored file is deleted once no row refers to it. Rows referring to an existing stored file lock its name
+until the end of their transaction, and the deletion takes the same lock after the deleting transaction
+is committed and checks the rows again, so that a file is not deleted while a new row is attached to it
+"""
+from django.db import connection, transaction
+
+# advisory lock class of stored file names, a name is locked by its hash
+STORED_FILE_LOCK = 0x626c6f62
+
+
+def lock_stored_file(name: str, referring) -> bool:
+    """
+    Lock the stored file against deletion until the end of the transaction
+    :param name: stored file name
+    :param referring: queryset of rows referring to the file
+    :return: False if no row refers to the file anymore, it is deleted or about to be deleted
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', [STORED_FILE_LOCK, name])
+    return referring.exists()
+
+
+def delete_stored_file(storage, name: str, referring):
+    """
+    Delete the stored file once the current transaction is committed, unless rows still refer to it
+    :param storage: storage of the file
+    :param name: stored file name
+    :param referring: queryset of rows referring to the file
+    """
+    def delete():
+        with transaction.atomic():
+            if lock_stored_file(name, referring):
+                return
+            try:
+                storage.delete(name)
+            except Exception:
+                pass
+
+    transaction.on_commit(delete)
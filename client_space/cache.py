@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class ItemFileCache:
+    """
+    Bounded in-process LRU cache of item file paths to ItemFile ids.
+    Entries are dropped by ItemFile signals of this process and expire after a timeout
+    to pick up changes made by other processes
+    """
+
+    def __init__(self, max_size: int = None, timeout: float = None):
+        self.max_size = max_size or getattr(settings, 'ITEM_FILE_CACHE_SIZE', 1024)
+        self.timeout = timeout or getattr(settings, 'ITEM_FILE_CACHE_TIMEOUT', 300)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, paths) -> dict:
+        """
+        Resolve item file paths to ItemFile ids, querying database only for the paths not cached
+        :param paths: iterable of item file paths
+        :return: dict path -> ItemFile id for the paths found
+        """
+        result = {}
+        missing = set()
+        now = time.monotonic()
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get(path)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(path)
+                    result[path] = entry[0]
+                else:
+                    missing.add(path)
+
+        if missing:
+            from client_space.models import ItemFile
+            referring = {}
+            for path, item_file_id, is_active in ItemFile.objects.filter(image__in=missing).values_list('image', 'id', 'item__is_active'):
+                referring.setdefault(path, []).append((item_file_id, is_active))
+            found = {}
+            shared = {}
+            for path, item_files in referring.items():
+                if len(item_files) == 1:
+                    found[path] = item_files[0][0]
+                    continue
+                # a stored file shared by several items resolves to the only active one of them, otherwise its id is needed.
+                # The active item may change, so shared paths are not cached
+                active = [item_file_id for item_file_id, is_active in item_files if is_active]
+                if len(active) == 1:
+                    shared[path] = active[0]
+            self._store(found, now + self.timeout)
+            result.update(found)
+            result.update(shared)
+        return result
+
+    def _store(self, found: dict, expires: float):
+        with self._lock:
+            for path, item_file_id in found.items():
+                self._entries[path] = (item_file_id, expires)
+                self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, item_file_id: int = None, path: str = None):
+        """Drop entries of an item file by its id and/or path"""
+        with self._lock:
+            if path:
+                self._entries.pop(path, None)
+            if item_file_id is not None:
+                for cached_path in [p for p, entry in self._entries.items() if entry[0] == item_file_id]:
+                    del self._entries[cached_path]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+item_file_cache = ItemFileCache()
@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+
+from client_space.media import media_urls
+
+
+class _IndexedItem:
+    def __init__(self, areas, data, cells):
+        self.areas = areas
+        self.prepared = areas.prepared
+        self.extent = areas.extent
+        self.data = data
+        self.cells = cells
+
+
+class ActiveItemIndex:
+    """
+    In-process spatial index of areas of active items.
+    Areas are rasterised into a grid of AD_GRID_CELL_SIZE cells: cells inside an area need no further test,
+    only points in cells crossing the area boundary are tested against the prepared geometry.
+    Items covering more than AD_GRID_MAX_CELLS cells are tested by their bounding boxes.
+    Items are refreshed one by one after Item and ItemFile signals of this process,
+    the whole index is rebuilt every AD_INDEX_TIMEOUT seconds to pick up changes made by other processes
+    """
+
+    def __init__(self, timeout: float = None, cell_size: float = None, max_cells: int = None):
+        self.timeout = timeout or getattr(settings, 'AD_INDEX_TIMEOUT', 300)
+        self.cell_size = cell_size or getattr(settings, 'AD_GRID_CELL_SIZE', 0.01)
+        self.max_cells = max_cells or getattr(settings, 'AD_GRID_MAX_CELLS', 10_000)
+        # prepared geometries are not safe to share between threads
+        self._lock = threading.Lock()
+        self._items = {}
+        self._cells = {}
+        self._large = set()
+        self._loaded_at = 0
+        self._dirty = set()
+        self._stale = True
+
+    def invalidate(self, item_id: int = None):
+        """Refresh the item, or rebuild the whole index if no item is given, on the next lookup"""
+        if item_id is None:
+            self._stale = True
+        else:
+            self._dirty.add(item_id)
+
+    def _cell(self, x: float, y: float) -> tuple:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _rasterize(self, areas, prepared):
+        """
+        Grid cells touched by the areas
+        :return: dict cell -> True if the cell is inside the areas, None if the areas cover too many cells
+        """
+        xmin, ymin, xmax, ymax = areas.extent
+        i0, j0 = self._cell(xmin, ymin)
+        i1, j1 = self._cell(xmax, ymax)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_cells:
+            return None
+
+        cells = {}
+        size = self.cell_size
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cell = Polygon.from_bbox((i * size, j * size, (i + 1) * size, (j + 1) * size))
+                cell.srid = areas.srid
+                if prepared.contains_properly(cell):
+                    cells[(i, j)] = True
+                elif prepared.intersects(cell):
+                    cells[(i, j)] = False
+        return cells
+
+    def _remove(self, item_id: int):
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        self._large.discard(item_id)
+        for cell in entry.cells or ():
+            items = self._cells.get(cell)
+            if items is not None:
+                items.pop(item_id, None)
+                if not items:
+                    del self._cells[cell]
+
+    def _add(self, item, previous: _IndexedItem = None):
+        """Add the item removed from the index, previous is its former entry"""
+        if previous is not None and previous.areas.equals_exact(item.areas):
+            # areas are the same, keep the cells
+            cells = previous.cells
+        else:
+            cells = self._rasterize(item.areas, item.areas.prepared)
+
+        item_files = list(item.items.all())
+        data = {
+            "id": item.pk,
+            "name": item.name,
+            "client": item.client.name,
+            "item_files": [{"id": f.pk, "image": f.image.name, "url": url}
+                           for f, url in zip(item_files, media_urls([f.image.name for f in item_files]))],
+        }
+        self._items[item.pk] = _IndexedItem(item.areas, data, cells)
+        if cells is None:
+            self._large.add(item.pk)
+            return
+        for cell, inside in cells.items():
+            self._cells.setdefault(cell, {})[item.pk] = inside
+
+    def _refresh(self, item_ids=None):
+        from client_space.models import Item
+
+        items = Item.objects.filter(is_active=True).select_related('client').prefetch_related('items')
+        if item_ids is None:
+            # the rebuilt index keeps cells of items with the same areas
+            previous = self._items
+            self._items, self._cells, self._large = {}, {}, set()
+            self._loaded_at = time.monotonic()
+        else:
+            items = items.filter(pk__in=item_ids)
+            previous = {item_id: self._items[item_id] for item_id in item_ids if item_id in self._items}
+            for item_id in item_ids:
+                self._remove(item_id)
+        for item in items:
+            self._add(item, previous.get(item.pk))
+
+    def _ensure_fresh(self):
+        if self._stale or time.monotonic() - self._loaded_at > self.timeout:
+            self._stale = False
+            self._dirty.clear()
+            try:
+                self._refresh()
+            except Exception:
+                self._stale = True
+                raise
+        elif self._dirty:
+            item_ids, self._dirty = self._dirty, set()
+            try:
+                self._refresh(item_ids)
+            except Exception:
+                self._dirty |= item_ids
+                raise
+
+    def lookup(self, point) -> list:
+        """
+        Active items whose areas contain the point
+        :param point: GEOS Point in the SRID of Item.areas
+        :return: list of dicts with item id, name, client and item files
+        """
+        x, y = point.x, point.y
+        with self._lock:
+            self._ensure_fresh()
+            result = []
+            for item_id, inside in self._cells.get(self._cell(x, y), {}).items():
+                if inside or self._items[item_id].prepared.contains(point):
+                    result.append(self._items[item_id].data)
+            for item_id in self._large:
+                entry = self._items[item_id]
+                xmin, ymin, xmax, ymax = entry.extent
+                if xmin <= x <= xmax and ymin <= y <= ymax and entry.prepared.contains(point):
+                    result.append(entry.data)
+            return result
+
+
+active_item_index = ActiveItemIndex()
@@ -0,0 +1,40 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from client_space.manifest import update_manifest
+from client_space.models import ItemFile
+from client_space.uploads import file_digests
+
+
+class Command(BaseCommand):
+    help = 'Hash stored item files saved before their md5 or sha256 were kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of item files hashed at a time')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        hashed = 0
+        while True:
+            batch = list(ItemFile.objects.filter(Q(md5='') | Q(sha256=''), pk__gt=last_id)
+                         .order_by('pk').values_list('pk', 'image', 'item_id')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            # item files sharing a stored file are hashed once
+            for name in dict.fromkeys(image for _, image, _ in batch):
+                try:
+                    with default_storage.open(name, 'rb') as f:
+                        md5, sha256 = file_digests(f)
+                except Exception as e:
+                    self.stderr.write(f'Failed to hash {name}: {e}')
+                    continue
+                ItemFile.objects.filter(image=name, sha256='').update(sha256=sha256)
+                # an item has one file with the same content
+                ItemFile.objects.filter(image=name, md5='').exclude(
+                    item_id__in=ItemFile.objects.filter(md5=md5).values('item_id')).update(md5=md5)
+                hashed += 1
+            # manifests list the md5 of item files
+            update_manifest({item_id for _, _, item_id in batch})
+        self.stdout.write(f'Hashed {hashed} stored files')
@@ -0,0 +1,25 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from client_space.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Abort unfinished item file uploads not updated for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None,
+                            help='Abort uploads not updated for this number of hours, UPLOAD_SESSION_TIMEOUT by default')
+
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.UPLOAD_SESSION_TIMEOUT
+        before = timezone.now() - datetime.timedelta(hours=hours)
+        # sessions are deleted one by one so that pre_delete aborts their multipart uploads
+        aborted = 0
+        for session in UploadSession.objects.filter(updated_at__lt=before):
+            session.delete()
+            aborted += 1
+        self.stdout.write(f'Aborted {aborted} uploads')
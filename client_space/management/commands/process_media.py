@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from client_space import processing
+from client_space.models import ItemFile
+
+
+def _process(item_file_id: int) -> str:
+    try:
+        return processing.process_item_file(item_file_id)
+    finally:
+        # every thread of the pool has its own database connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Extract metadata and make renditions of uploaded item files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of item files processed at once, MEDIA_WORKERS by default')
+        parser.add_argument('--loop', action='store_true', help='Keep processing new item files until interrupted')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when there is nothing to process')
+        parser.add_argument('--stale-after', type=float, default=3600,
+                            help='Seconds after which item files claimed by a dead worker are processed again')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.MEDIA_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # item files of workers which died meanwhile are picked up by running workers
+                processing.requeue_stale(options['stale_after'])
+                claimed = processing.claim(workers)
+                statuses = list(pool.map(_process, claimed))
+                if claimed:
+                    self.stdout.write(f'Processed {statuses.count(ItemFile.Statuses.READY)} item files, '
+                                      f'failed {statuses.count(ItemFile.Statuses.FAILED)}')
+                if not options['loop']:
+                    if not claimed:
+                        break
+                    continue
+                if not claimed:
+                    time.sleep(options['interval'])
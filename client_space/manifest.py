@@ -0,0 +1,103 @@
+"""
+Manifest of item files video modules keep locally.
+The manifest lists files of active items. Every change of the manifest is a new ManifestRevision,
+listed files are ManifestFile rows stamped with the revision of their last change, removed files are kept
+as tombstones, so that a module synced at a revision gets only the files changed after it
+"""
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+# advisory lock serializing manifest updates, so that revisions become visible in the order of their numbers
+MANIFEST_LOCK = 0x6d616e6966
+
+
+def update_manifest(item_ids) -> int:
+    """
+    Update manifest files of the items from their current state
+    :param item_ids: ids of changed items
+    :return: new revision, None if the manifest is not changed
+    """
+    from client_space.models import ItemFile, ManifestFile, ManifestRevision, Rendition
+
+    item_ids = set(item_ids)
+    if not item_ids:
+        return None
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [MANIFEST_LOCK])
+
+        current = {f.pk: f for f in ItemFile.objects.filter(item__in=item_ids, item__is_active=True)
+                   .only('id', 'item', 'image', 'md5', 'size').prefetch_related(Prefetch('renditions', Rendition.objects.order_by('kind')))}
+        listed = {f.item_file_id: f for f in ManifestFile.objects.filter(item_id__in=item_ids)}
+
+        changed, created = [], []
+        for pk, item_file in current.items():
+            renditions = {r.kind: {"path": r.file.name, "content_type": r.content_type, "width": r.width,
+                                   "height": r.height, "size": r.size} for r in item_file.renditions.all()}
+            entry = listed.get(pk)
+            if entry is None:
+                created.append(ManifestFile(item_file_id=pk))
+                entry = created[-1]
+            elif entry.removed or (entry.path, entry.md5, entry.size, entry.renditions) != \
+                    (item_file.image.name, item_file.md5, item_file.size, renditions):
+                changed.append(entry)
+            else:
+                continue
+            entry.item_id = item_file.item_id
+            entry.path = item_file.image.name
+            entry.md5 = item_file.md5
+            entry.size = item_file.size
+            entry.renditions = renditions
+            entry.removed = False
+        for pk, entry in listed.items():
+            if pk not in current and not entry.removed:
+                entry.removed = True
+                changed.append(entry)
+
+        if not changed and not created:
+            return None
+        revision = ManifestRevision.objects.create().pk
+        for entry in changed + created:
+            entry.revision = revision
+        ManifestFile.objects.bulk_update(changed, ['item_id', 'path', 'md5', 'size', 'renditions', 'removed', 'revision'])
+        ManifestFile.objects.bulk_create(created)
+    return revision
+
+
+def current_revision() -> int:
+    """Latest manifest revision, 0 for the empty manifest"""
+    from client_space.models import ManifestRevision
+
+    return ManifestRevision.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def manifest_changes(since: int = None):
+    """
+    Manifest files changed after the revision
+    :param since: revision of the module, the whole manifest is returned if None
+    :return: revision, listed files, ids of removed item files
+    """
+    from client_space.models import ManifestFile
+
+    # the revision is read first, files of later revisions are sent again with the next sync
+    revision = current_revision()
+    if since is None:
+        return revision, list(ManifestFile.objects.filter(removed=False).order_by('item_file_id')), []
+
+    entries = list(ManifestFile.objects.filter(revision__gt=since).order_by('item_file_id'))
+    files = [entry for entry in entries if not entry.removed]
+    removed = [entry.item_file_id for entry in entries if entry.removed]
+    return revision, files, removed
+
+
+def listed_files(item_file_ids):
+    """
+    Listed manifest files of the item files
+    :param item_file_ids: ids of item files
+    :return: revision, listed files
+    """
+    from client_space.models import ManifestFile
+
+    revision = current_revision()
+    return revision, list(ManifestFile.objects.filter(item_file_id__in=item_file_ids, removed=False).order_by('item_file_id'))
@@ -0,0 +1,65 @@
+"""
+URLs of stored item files.
+With MEDIA_CDN_URL set, files are served by the CDN from stable URLs.
+Otherwise URLs come from the default storage: presigned S3 URLs are cached for periods ending MEDIA_URL_EXPIRY_MARGIN
+seconds before they expire, so that a file is signed once per period rather than on every request.
+Cached URLs are dropped at the end of the period, responses with URLs add url_version to their ETags
+so that clients don't keep URLs beyond the period.
+Both are plain GET URLs of the objects, so modules can download files with HTTP range requests
+"""
+import hashlib
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+
+def _key(name: str) -> str:
+    return f'media_url:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def _url_timeout(storage) -> int:
+    """Seconds to cache URLs of the storage, 0 if URLs are not signed or expire too soon"""
+    if not getattr(storage, 'querystring_auth', False):
+        return 0
+    return max(0, storage.querystring_expire - getattr(settings, 'MEDIA_URL_EXPIRY_MARGIN', 300))
+
+
+def media_urls(names) -> list:
+    """
+    URLs of stored files
+    :param names: list of file names in the default storage
+    :return: list of URLs in the order of the names
+    """
+    cdn_url = getattr(settings, 'MEDIA_CDN_URL', '')
+    if cdn_url:
+        return [f"{cdn_url.rstrip('/')}/{quote(name)}" for name in names]
+
+    timeout = _url_timeout(default_storage)
+    if not timeout:
+        return [default_storage.url(name) for name in names]
+
+    keys = {name: _key(name) for name in names}
+    cached = cache.get_many(keys.values())
+    missing = {keys[name]: default_storage.url(name) for name in names if keys[name] not in cached}
+    if missing:
+        # URLs are cached until the end of the period
+        cache.set_many(missing, timeout - int(time.time()) % timeout)
+        cached.update(missing)
+    return [cached[keys[name]] for name in names]
+
+
+def url_version() -> int:
+    """Version of URLs returned by media_urls, changes every period of signed URLs and is 0 for stable URLs"""
+    if getattr(settings, 'MEDIA_CDN_URL', '') or not getattr(default_storage, 'querystring_auth', False):
+        return 0
+    timeout = _url_timeout(default_storage)
+    # URLs signed on every request change every second
+    return int(time.time()) // timeout if timeout else int(time.time())
+
+
+def media_url(name: str) -> str:
+    """URL of a stored file"""
+    return media_urls([name])[0]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0 on 2026-10-17 14:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('client_space', '0007_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, verbose_name='storage path')),
+                ('size', models.BigIntegerField(verbose_name='file size')),
+                ('received', models.BigIntegerField(default=0, verbose_name='received bytes')),
+                ('upload_id', models.CharField(default='', max_length=1024, verbose_name='multipart upload id')),
+                ('parts', models.JSONField(default=list, verbose_name='uploaded parts')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='client_space.item')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0 on 2026-10-17 15:40
+
+import client_space.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemfile',
+            name='image',
+            field=models.FileField(db_index=True, upload_to=client_space.models.item_file_path, verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='itemfile',
+            name='md5',
+            field=models.CharField(db_index=True, default='', max_length=32, verbose_name='image md5'),
+        ),
+    ]
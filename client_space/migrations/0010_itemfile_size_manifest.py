@@ -0,0 +1,64 @@
+# Generated by Django 4.0 on 2026-10-17 16:30
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def build_manifest(apps, schema_editor):
+    """Fill sizes of stored item files and list files of active items in the first manifest revision"""
+    ItemFile = apps.get_model('client_space', 'ItemFile')
+    ManifestFile = apps.get_model('client_space', 'ManifestFile')
+    ManifestRevision = apps.get_model('client_space', 'ManifestRevision')
+
+    for item_file in ItemFile.objects.filter(size__isnull=True).only('id', 'image'):
+        try:
+            item_file.size = default_storage.size(item_file.image.name)
+        except Exception:
+            continue
+        item_file.save(update_fields=['size'])
+
+    item_files = ItemFile.objects.filter(item__is_active=True).only('id', 'item', 'image', 'md5', 'size')
+    if not item_files.exists():
+        return
+    revision = ManifestRevision.objects.create().pk
+    ManifestFile.objects.bulk_create(
+        [ManifestFile(item_file_id=f.pk, item_id=f.item_id, path=f.image.name, md5=f.md5, size=f.size, revision=revision)
+         for f in item_files.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0009_alter_itemfile_image_md5'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemfile',
+            name='size',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='image size'),
+        ),
+        migrations.CreateModel(
+            name='ManifestRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ManifestFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_file_id', models.BigIntegerField(unique=True, verbose_name='item file id')),
+                ('item_id', models.BigIntegerField(db_index=True, verbose_name='item id')),
+                ('path', models.CharField(max_length=1024, verbose_name='storage path')),
+                ('md5', models.CharField(default='', max_length=32, verbose_name='image md5')),
+                ('size', models.BigIntegerField(blank=True, null=True, verbose_name='image size')),
+                ('removed', models.BooleanField(default=False, verbose_name='removed')),
+                ('revision', models.BigIntegerField(db_index=True, verbose_name='changed at revision')),
+            ],
+        ),
+        migrations.RunPython(build_manifest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0 on 2026-10-17 17:10
+
+import client_space.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0010_itemfile_size_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemfile',
+            name='metadata',
+            field=models.JSONField(blank=True, null=True, verbose_name='media metadata'),
+        ),
+        migrations.AddField(
+            model_name='itemfile',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='processing started or finished at'),
+        ),
+        migrations.AddField(
+            model_name='itemfile',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Processing'), ('D', 'Ready'), ('F', 'Failed')], db_index=True, default='P', max_length=1, verbose_name='processing status'),
+        ),
+        migrations.AddField(
+            model_name='manifestfile',
+            name='renditions',
+            field=models.JSONField(default=dict, verbose_name='renditions'),
+        ),
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('thumbnail', 'Thumbnail'), ('screen', 'Screen')], max_length=16, verbose_name='kind')),
+                ('file', models.FileField(db_index=True, max_length=255, upload_to=client_space.models.rendition_path, verbose_name='file')),
+                ('content_type', models.CharField(default='', max_length=64, verbose_name='content type')),
+                ('width', models.IntegerField(blank=True, null=True, verbose_name='width')),
+                ('height', models.IntegerField(blank=True, null=True, verbose_name='height')),
+                ('size', models.BigIntegerField(blank=True, null=True, verbose_name='file size')),
+                ('item_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='client_space.itemfile')),
+            ],
+            options={
+                'unique_together': {('item_file', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0 on 2026-10-17 19:20
+
+import client_space.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0011_itemfile_processing_rendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='chunk_size',
+            field=models.IntegerField(default=client_space.uploads.chunk_size, verbose_name='part size'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='digests',
+            field=models.BinaryField(default=bytes, editable=False, verbose_name='state of the file digests'),
+        ),
+    ]
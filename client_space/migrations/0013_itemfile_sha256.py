@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0012_uploadsession_chunk_size_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemfile',
+            name='sha256',
+            field=models.CharField(db_index=True, default='', max_length=64, verbose_name='image sha256'),
+        ),
+    ]
@@ -1,11 +1,19 @@
 import os
-from hashlib import md5
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models as geomodel
-from django.db import models
+from django.db import models, transaction
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from client_space.blobs import delete_stored_file, lock_stored_file
+from client_space.cache import item_file_cache
+from client_space.item_index import active_item_index
+from client_space.manifest import update_manifest
+from client_space.tiles import invalidate_tiles
+from client_space.uploads import chunk_size, file_digests, get_upload
 
 
 def get_srid(lat: float = None, lon: float = None) -> int:
@@ -47,6 +55,18 @@ def client_directory_path(instance, filename) -> str:
     return os.path.join('images', str(instance.item.client.name), str(instance.item.name), filename)
 
 
+def item_file_path(instance, filename) -> str:
+    """
+    Content-addressed path to store an item file: item files with the same sha256 share one stored file
+    :param instance: ItemFile instance
+    :param filename:
+    :return: path to store the file
+    """
+    if not instance.sha256:
+        return client_directory_path(instance, filename)
+    return os.path.join('blobs', instance.sha256[:2], instance.sha256 + os.path.splitext(filename)[1].lower())
+
+
 class Item(models.Model):
     """Item object contains one campaign input information like client, name, areas etc."""
     client = models.ForeignKey(Client, on_delete=models.RESTRICT)
@@ -56,6 +76,7 @@ class Item(models.Model):
     is_active = models.BooleanField(verbose_name='Item is active', default=False)
     max_rate = models.DecimalField(verbose_name='Maximum Show Rate', max_digits=8, decimal_places=2, default=10)
     max_daily_spend = models.DecimalField(verbose_name='Maximum Daily Spends', max_digits=11, decimal_places=2, default=100)
+    updated_at = models.DateTimeField(verbose_name='Updated at', auto_now=True)
 
     class Meta:
         unique_together = [['client', 'name'], ]
@@ -77,9 +98,23 @@ class Item(models.Model):
 
 class ItemFile(models.Model):
     """Item files"""
+
+    class Statuses(models.TextChoices):
+        """Media processing statuses, see client_space.processing"""
+        PENDING = 'P', _('Pending')
+        PROCESSING = 'R', _('Processing')
+        READY = 'D', _('Ready')
+        FAILED = 'F', _('Failed')
+
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='items')
-    image = models.FileField(verbose_name='image', upload_to=client_directory_path, )
-    md5 = models.CharField(verbose_name='image md5', max_length=32, default='')
+    image = models.FileField(verbose_name='image', upload_to=item_file_path, db_index=True)
+    md5 = models.CharField(verbose_name='image md5', max_length=32, default='', db_index=True)
+    sha256 = models.CharField(verbose_name='image sha256', max_length=64, default='', db_index=True)
+    size = models.BigIntegerField(verbose_name='image size', null=True, blank=True)
+    status = models.CharField(verbose_name='processing status', max_length=1, choices=Statuses.choices,
+                              default=Statuses.PENDING, db_index=True)
+    metadata = models.JSONField(verbose_name='media metadata', blank=True, null=True)
+    processed_at = models.DateTimeField(verbose_name='processing started or finished at', blank=True, null=True)
 
     class Meta:
         unique_together = [['item', 'md5'], ]
@@ -88,26 +123,209 @@ class ItemFile(models.Model):
     def __str__(self):
         return self.image.name
 
-    def get_md5(self):
-        """Get MD5 of the file"""
-        result = md5(self.image.read()).hexdigest()
-        self.image.seek(0)
-        return result
+    def save(self, *args, **kwargs):
+        # a stored file the item file refers to is locked until the item file is saved, see client_space.blobs
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def get_digests(self) -> tuple:
+        """Get md5 and sha256 of the file, uploaded files carry the digests computed while they were received"""
+        if not self.image._committed:
+            md5, sha256 = getattr(self.image.file, 'md5', None), getattr(self.image.file, 'sha256', None)
+            if md5 and sha256:
+                return md5, sha256
+        return file_digests(self.image)
+
+
+def rendition_path(instance, filename) -> str:
+    """
+    Path to store a rendition, every processing of an item file saves its renditions to its own directory,
+    so that concurrent processing and cleanup of failed processing don't touch renditions of others.
+    Item files sharing a stored file refer to the same renditions
+    :param instance: Rendition instance
+    :param filename: name prefixed with the directory of the processing
+    :return: path to store the rendition
+    """
+    return os.path.join('renditions', str(instance.item_file_id), filename)
+
+
+class Rendition(models.Model):
+    """Thumbnail or normalized copy of an item file made by media processing"""
+
+    class Kinds(models.TextChoices):
+        """Rendition kinds"""
+        THUMBNAIL = 'thumbnail', _('Thumbnail')
+        SCREEN = 'screen', _('Screen')
+
+    item_file = models.ForeignKey(ItemFile, on_delete=models.CASCADE, related_name='renditions')
+    kind = models.CharField(verbose_name='kind', max_length=16, choices=Kinds.choices)
+    file = models.FileField(verbose_name='file', upload_to=rendition_path, max_length=255, db_index=True)
+    content_type = models.CharField(verbose_name='content type', max_length=64, default='')
+    width = models.IntegerField(verbose_name='width', null=True, blank=True)
+    height = models.IntegerField(verbose_name='height', null=True, blank=True)
+    size = models.BigIntegerField(verbose_name='file size', null=True, blank=True)
+
+    class Meta:
+        unique_together = [['item_file', 'kind'], ]
+
+    def __str__(self):
+        return self.file.name
+
+
+class UploadSession(models.Model):
+    """Chunked upload of an item file, see client_space.uploads"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='uploads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    path = models.CharField(verbose_name='storage path', max_length=1024)
+    size = models.BigIntegerField(verbose_name='file size')
+    chunk_size = models.IntegerField(verbose_name='part size', default=chunk_size)
+    received = models.BigIntegerField(verbose_name='received bytes', default=0)
+    upload_id = models.CharField(verbose_name='multipart upload id', max_length=1024, default='')
+    parts = models.JSONField(verbose_name='uploaded parts', default=list)
+    digests = models.BinaryField(verbose_name='state of the file digests', default=bytes, editable=False)
+    updated_at = models.DateTimeField(verbose_name='Updated at', auto_now=True)
+
+    def __str__(self):
+        return self.path
+
+
+class CacheGeneration(models.Model):
+    """Generation of cached data shared by all processes, see client_space.tiles"""
+    name = models.CharField(max_length=64, unique=True)
+    generation = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.generation}"
+
+
+class ManifestRevision(models.Model):
+    """Revision of the manifest of item files, see client_space.manifest"""
+    created_at = models.DateTimeField(verbose_name='Created at', auto_now_add=True)
+
+    def __str__(self):
+        return str(self.pk)
+
+
+class ManifestFile(models.Model):
+    """Item file in the manifest, removed files are kept to be sent to modules as removed"""
+    item_file_id = models.BigIntegerField(verbose_name='item file id', unique=True)
+    item_id = models.BigIntegerField(verbose_name='item id', db_index=True)
+    path = models.CharField(verbose_name='storage path', max_length=1024)
+    md5 = models.CharField(verbose_name='image md5', max_length=32, default='')
+    size = models.BigIntegerField(verbose_name='image size', null=True, blank=True)
+    renditions = models.JSONField(verbose_name='renditions', default=dict)
+    removed = models.BooleanField(verbose_name='removed', default=False)
+    revision = models.BigIntegerField(verbose_name='changed at revision', db_index=True)
+
+    def __str__(self):
+        return self.path
 
 
 @receiver(models.signals.pre_delete, sender=ItemFile)
 def pre_delete_image(sender, instance, *args, **kwargs):
-    """ Clean Old Image file """
-    try:
-        instance.image.delete(save=False)
-    except Exception:
-        pass
+    """ Clean Old Image file unless other item files share it """
+    item_file_cache.invalidate(instance.pk, instance.image.name)
+    delete_stored_file(instance.image.storage, instance.image.name, ItemFile.objects.filter(image=instance.image.name))
 
 
 @receiver(models.signals.pre_save, sender=ItemFile)
 def pre_save_image(sender, instance, *args, **kwargs):
-    """ Clean Old Image file """
+    """ Hash a new file and refer to a stored file with the same content instead of storing it again """
+    item_file_cache.invalidate(instance.pk, instance.image.name)
+    if not instance.image._committed:
+        # only new files are hashed, files stored before the digests were kept are hashed by backfill_digests
+        try:
+            instance.md5, instance.sha256 = instance.get_digests()
+        except Exception:
+            pass
+    if instance.size is None or not instance.image._committed:
+        try:
+            instance.size = instance.image.size
+        except Exception:
+            pass
+    if not instance.image._committed:
+        # the new file is processed again
+        instance.status = ItemFile.Statuses.PENDING
+    if instance.sha256 and not instance.image._committed:
+        # the same content is stored already, refer to it instead of uploading.
+        # Only the sha256 computed here is trusted to share files across clients
+        stored = ItemFile.objects.filter(sha256=instance.sha256).exclude(pk=instance.pk).values_list('image', flat=True).first()
+        if stored and lock_stored_file(stored, ItemFile.objects.filter(image=stored).exclude(pk=instance.pk)):
+            instance.image = stored
+
+
+@receiver(models.signals.pre_delete, sender=Rendition)
+def pre_delete_rendition(sender, instance, *args, **kwargs):
+    """ Clean rendition file unless other renditions share it """
+    delete_stored_file(instance.file.storage, instance.file.name, Rendition.objects.filter(file=instance.file.name))
+
+
+@receiver(models.signals.pre_delete, sender=UploadSession)
+def abort_upload(sender, instance, *args, **kwargs):
+    """ Abort unfinished multipart upload """
+    if not instance.upload_id:
+        return
     try:
-        instance.md5 = instance.get_md5()
+        get_upload(instance.path, instance.upload_id).abort()
     except Exception:
         pass
+
+
+@receiver(models.signals.post_save, sender=ItemFile)
+@receiver(models.signals.post_delete, sender=ItemFile)
+def touch_item(sender, instance, *args, **kwargs):
+    """ Bump updated_at of the item when its files change """
+    Item.objects.filter(pk=instance.item_id).update(updated_at=timezone.now())
+
+
+@receiver(models.signals.post_save, sender=Item)
+@receiver(models.signals.post_delete, sender=Item)
+def item_areas_changed(sender, instance, *args, **kwargs):
+    """ Drop cached tiles of items areas """
+    invalidate_tiles()
+
+
+@receiver(models.signals.post_save, sender=Item)
+@receiver(models.signals.post_delete, sender=Item)
+@receiver(models.signals.post_save, sender=ItemFile)
+@receiver(models.signals.post_delete, sender=ItemFile)
+def item_changed(sender, instance, *args, **kwargs):
+    """ Refresh the item in the in-process index of active items """
+    active_item_index.invalidate(instance.pk if sender is Item else instance.item_id)
+
+
+def _manifest_state(instance) -> tuple:
+    """Fields of the item or the item file listed in the manifest, None if they are not loaded"""
+    if isinstance(instance, Item):
+        return None if 'is_active' in instance.get_deferred_fields() else (instance.is_active, )
+    if instance.get_deferred_fields().intersection(['item_id', 'image', 'md5', 'size']):
+        return None
+    return instance.item_id, instance.image.name, instance.md5, instance.size
+
+
+@receiver(models.signals.post_init, sender=Item)
+@receiver(models.signals.post_init, sender=ItemFile)
+def keep_manifest_state(sender, instance, *args, **kwargs):
+    """ Keep fields listed in the manifest to update it only when they change """
+    instance._manifest_state = _manifest_state(instance)
+
+
+@receiver(models.signals.post_save, sender=Item)
+@receiver(models.signals.post_save, sender=ItemFile)
+def item_manifest_changed(sender, instance, *args, **kwargs):
+    """ Update manifest files of the item if fields listed in the manifest are changed """
+    previous, instance._manifest_state = instance._manifest_state, _manifest_state(instance)
+    if previous is not None and previous == instance._manifest_state:
+        return
+    if sender is Item:
+        update_manifest([instance.pk])
+    else:
+        # an item file moved to another item is removed from the manifest of the previous one
+        update_manifest({instance.item_id, previous[0] if previous else None} - {None})
+
+
+@receiver(models.signals.post_delete, sender=Item)
+@receiver(models.signals.post_delete, sender=ItemFile)
+def item_manifest_deleted(sender, instance, *args, **kwargs):
+    """ Update manifest files of the item """
+    update_manifest([instance.pk if sender is Item else instance.item_id])
@@ -0,0 +1,252 @@
+"""
+Background processing of item files.
+ItemFile.status is the job queue: saved item files are pending, `manage.py process_media` claims them
+with SELECT ... FOR UPDATE SKIP LOCKED, so that several workers can run at once, and processes them in a pool of threads.
+Processing extracts metadata and makes renditions: a thumbnail and a screen copy fitting
+MEDIA_RENDITION_WIDTH x MEDIA_RENDITION_HEIGHT. Images are processed with Pillow,
+videos with ffprobe and ffmpeg, which fail the processing if they are not installed.
+Item files sharing a stored file with a processed one reuse its metadata and renditions
+"""
+import datetime
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from client_space.blobs import lock_stored_file
+from client_space.manifest import update_manifest
+
+THUMBNAIL_QUALITY = 80
+SCREEN_QUALITY = 85
+
+
+class ProcessingError(Exception):
+    """Item file cannot be processed"""
+
+
+def _run(args, **kwargs) -> bytes:
+    try:
+        result = subprocess.run(args, capture_output=True, check=True,
+                                timeout=getattr(settings, 'MEDIA_PROCESSING_TIMEOUT', 600), **kwargs)
+    except FileNotFoundError:
+        raise ProcessingError(f'{args[0]} is not installed')
+    except subprocess.CalledProcessError as e:
+        raise ProcessingError(f'{args[0]} failed: {e.stderr.decode(errors="replace")[-500:]}')
+    except subprocess.TimeoutExpired:
+        raise ProcessingError(f'{args[0]} timed out')
+    return result.stdout
+
+
+def _screen_size() -> tuple:
+    return settings.MEDIA_RENDITION_WIDTH, settings.MEDIA_RENDITION_HEIGHT
+
+
+def _jpeg(image, size: tuple, quality: int) -> tuple:
+    """Image resized to fit the size as JPEG: content, width, height"""
+    image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS)
+    content = io.BytesIO()
+    image.save(content, 'JPEG', quality=quality, optimize=True)
+    return content.getvalue(), image.width, image.height
+
+
+def _thumbnail(image) -> dict:
+    size = settings.MEDIA_THUMBNAIL_SIZE
+    content, width, height = _jpeg(image, (size, size), THUMBNAIL_QUALITY)
+    return {"kind": "thumbnail", "name": "thumbnail.jpg", "content": content, "content_type": "image/jpeg",
+            "width": width, "height": height}
+
+
+def process_image(image) -> tuple:
+    """
+    Metadata and renditions of an image
+    :param image: opened PIL image
+    :return: metadata, list of renditions
+    """
+    metadata = {"type": "image", "format": image.format, "width": image.width, "height": image.height}
+    image = ImageOps.exif_transpose(image)
+    renditions = [_thumbnail(image)]
+    width, height = _screen_size()
+    if image.width > width or image.height > height:
+        content, w, h = _jpeg(image, (width, height), SCREEN_QUALITY)
+        renditions.append({"kind": "screen", "name": "screen.jpg", "content": content, "content_type": "image/jpeg",
+                           "width": w, "height": h})
+    return metadata, renditions
+
+
+def process_video(path: str, directory: str) -> tuple:
+    """
+    Metadata and renditions of a video: the first frame after a second as the thumbnail
+    and an H.264 MP4 copy fitting the screen size for streaming
+    :param path: local path of the video
+    :param directory: directory for temporary files, the MP4 copy is left in it
+    :return: metadata, list of renditions with content or path of a file in the directory
+    """
+    probe = json.loads(_run([settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+                             '-show_format', '-show_streams', path]))
+    video = next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise ProcessingError('No video stream')
+    duration = float(probe.get("format", {}).get("duration") or video.get("duration") or 0)
+    metadata = {
+        "type": "video",
+        "format": probe.get("format", {}).get("format_name"),
+        "codec": video.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "duration": duration,
+        "audio": any(s.get("codec_type") == "audio" for s in probe.get("streams", [])),
+    }
+
+    frame = _run([settings.FFMPEG_BINARY, '-v', 'error', '-ss', str(min(1.0, duration / 2)), '-i', path,
+                  '-frames:v', '1', '-f', 'image2pipe', '-vcodec', 'png', '-'])
+    with Image.open(io.BytesIO(frame)) as image:
+        renditions = [_thumbnail(image)]
+
+    width, height = _screen_size()
+    screen = os.path.join(directory, 'screen.mp4')
+    _run([settings.FFMPEG_BINARY, '-v', 'error', '-y', '-i', path,
+          '-vf', f"scale=w='min({width},iw)':h='min({height},ih)':force_original_aspect_ratio=decrease:force_divisible_by=2",
+          '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+          '-c:a', 'aac', '-b:a', '128k', screen])
+    scaled = json.loads(_run([settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+                              '-show_streams', '-select_streams', 'v:0', screen]))["streams"][0]
+    # the video is saved from the file rather than read into memory
+    renditions.append({"kind": "screen", "name": "screen.mp4", "path": screen, "content_type": "video/mp4",
+                       "width": scaled.get("width"), "height": scaled.get("height")})
+    return metadata, renditions
+
+
+def process_file(path: str, directory: str) -> tuple:
+    """Metadata and renditions of a local file"""
+    try:
+        image = Image.open(path)
+    except UnidentifiedImageError:
+        return process_video(path, directory)
+    with image:
+        return process_image(image)
+
+
+def claim(limit: int) -> list:
+    """
+    Claim pending item files for processing
+    :param limit: maximum number of item files
+    :return: ids of claimed item files
+    """
+    from client_space.models import ItemFile
+
+    with transaction.atomic():
+        ids = list(ItemFile.objects.select_for_update(skip_locked=True).filter(status=ItemFile.Statuses.PENDING)
+                   .order_by('pk').values_list('pk', flat=True)[:limit])
+        ItemFile.objects.filter(pk__in=ids).update(status=ItemFile.Statuses.PROCESSING, processed_at=timezone.now())
+    return ids
+
+
+def requeue_stale(seconds: float) -> int:
+    """Return item files claimed by dead workers to the queue"""
+    from client_space.models import ItemFile
+
+    before = timezone.now() - datetime.timedelta(seconds=seconds)
+    return ItemFile.objects.filter(status=ItemFile.Statuses.PROCESSING, processed_at__lt=before) \
+        .update(status=ItemFile.Statuses.PENDING)
+
+
+def _renditions_of_stored(item_file):
+    """Metadata and renditions of a processed item file sharing the stored file, None if there is none"""
+    from client_space.models import ItemFile
+
+    if not item_file.sha256:
+        return None
+    processed = ItemFile.objects.filter(sha256=item_file.sha256, status=ItemFile.Statuses.READY).exclude(pk=item_file.pk) \
+        .prefetch_related('renditions').first()
+    if processed is None:
+        return None
+    renditions = [{"kind": r.kind, "file": r.file.name, "content_type": r.content_type,
+                   "width": r.width, "height": r.height, "size": r.size} for r in processed.renditions.all()]
+    return processed.metadata, renditions
+
+
+def _render(item_file):
+    """Process the stored file, return metadata and renditions saved to the storage"""
+    from client_space.models import Rendition
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'source' + os.path.splitext(item_file.image.name)[1].lower())
+        with item_file.image.open('rb') as source, open(path, 'wb') as f:
+            shutil.copyfileobj(source, f)
+        metadata, rendered = process_file(path, directory)
+
+        renditions = []
+        job = uuid.uuid4().hex
+        for rendition in rendered:
+            name = Rendition._meta.get_field('file').generate_filename(Rendition(item_file=item_file),
+                                                                       os.path.join(job, rendition["name"]))
+            if "path" in rendition:
+                with open(rendition["path"], 'rb') as f:
+                    name = default_storage.save(name, File(f))
+                size = os.path.getsize(rendition["path"])
+            else:
+                name = default_storage.save(name, ContentFile(rendition["content"]))
+                size = len(rendition["content"])
+            renditions.append({"kind": rendition["kind"], "file": name, "content_type": rendition["content_type"],
+                               "width": rendition["width"], "height": rendition["height"], "size": size})
+    return metadata, renditions
+
+
+def process_item_file(item_file_id: int) -> str:
+    """
+    Process a claimed item file
+    :return: new status, None if the item file is deleted or changed while processing
+    """
+    from client_space.models import ItemFile, Rendition
+
+    try:
+        item_file = ItemFile.objects.get(pk=item_file_id)
+    except ItemFile.DoesNotExist:
+        return None
+
+    saved = []
+    try:
+        result = _renditions_of_stored(item_file)
+        if result is None:
+            result = _render(item_file)
+            saved = [rendition["file"] for rendition in result[1]]
+        metadata, renditions = result
+        status = ItemFile.Statuses.READY
+    except Exception as e:
+        metadata, renditions = {"error": str(e)}, []
+        status = ItemFile.Statuses.FAILED
+
+    with transaction.atomic():
+        current = ItemFile.objects.select_for_update().filter(pk=item_file_id).only('id', 'image', 'status').first()
+        if current is None or current.status != ItemFile.Statuses.PROCESSING or current.image.name != item_file.image.name:
+            current = None
+        elif any(not lock_stored_file(rendition["file"], Rendition.objects.filter(file=rendition["file"]))
+                 for rendition in renditions if rendition["file"] not in saved):
+            # the processed item file sharing the renditions is deleted meanwhile, the item file is processed again
+            ItemFile.objects.filter(pk=item_file_id).update(status=ItemFile.Statuses.PENDING)
+            current = None
+        else:
+            # renditions are deleted one by one so that their files are deleted
+            for rendition in Rendition.objects.filter(item_file=item_file_id):
+                rendition.delete()
+            Rendition.objects.bulk_create([Rendition(item_file_id=item_file_id, **rendition) for rendition in renditions])
+            ItemFile.objects.filter(pk=item_file_id).update(status=status, metadata=metadata, processed_at=timezone.now())
+
+    if current is None:
+        for name in saved:
+            default_storage.delete(name)
+        return None
+    update_manifest([item_file.item_id])
+    return status
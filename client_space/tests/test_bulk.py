@@ -0,0 +1,98 @@
+import json
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.urls import reverse
+
+from client_space.models import Client, ClientUser, Item
+
+test_user = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+
+        cl1 = Client.objects.create(name="Client1")
+        cl2 = Client.objects.create(name="Client2")
+        clu, _ = ClientUser.objects.get_or_create(user=new_user)
+        clu.client.add(cl1)
+        clu.save()
+
+        self.item1 = Item.objects.create(client=cl1, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)), max_rate=10)
+        self.item2 = Item.objects.create(client=cl2, name="Item2", areas=GEOSGeometry(json.dumps(test_areas)))
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def post(self, token, url, data):
+        return self.client.post(reverse(url), data=data, content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Bearer {token}'
+                                )
+
+    def test_bulk_ok(self):
+        """Items are created or updated by client and name"""
+        token = self.get_token()
+        items = [
+            {"client": "Client1", "name": "Item1", "areas": test_areas, "max_rate": 15, "max_daily_spend": 150, "is_active": True},
+            {"client": "Client1", "name": "Item88", "areas": test_areas, "max_rate": 12, "max_daily_spend": 110.01},
+        ]
+        res = self.post(token, 'client_space:item_bulk', {"items": items})
+        self.assertEquals(res.status_code, 200)
+        data = res.json()['data']
+        self.assertEquals([(entry['index'], entry['status']) for entry in data], [(0, 'updated'), (1, 'created')])
+        self.assertEquals(data[0]['id'], self.item1.pk)
+
+        self.item1.refresh_from_db()
+        self.assertEquals(self.item1.max_rate, 15)
+        self.assertTrue(self.item1.is_active)
+        item = Item.objects.get(pk=data[1]['id'])
+        self.assertEquals(str(item.max_daily_spend), '110.01')
+        self.assertFalse(item.is_active)
+
+    def test_bulk_errors(self):
+        """Nothing is saved if any item is not valid"""
+        token = self.get_token()
+        items = [
+            {"client": "Client1", "name": "Item88", "areas": test_areas},
+            {"client": "Client2", "name": "Item89", "areas": test_areas},
+            {"client": "Client1", "name": "Item88", "areas": test_areas},
+            {"client": "Client1", "name": "Item90", "areas": test_areas, "max_rate": "wrong"},
+        ]
+        res = self.post(token, 'client_space:item_bulk', {"items": items})
+        self.assertEquals(res.status_code, 400)
+        self.assertEquals([entry['index'] for entry in res.json()['errors']], [1, 2, 3])
+        self.assertFalse(Item.objects.filter(name__in=["Item88", "Item89", "Item90"]).exists())
+
+        res = self.post(token, 'client_space:item_bulk', {"items": []})
+        self.assertEquals(res.status_code, 400)
+
+    def test_bulk_active(self):
+        """Only items of the user are activated"""
+        token = self.get_token()
+        res = self.post(token, 'client_space:item_bulk_active', {"ids": [self.item1.pk, self.item2.pk], "is_active": True})
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(res.json()['data'], {"updated": [self.item1.pk], "not_found": [self.item2.pk]})
+        self.item1.refresh_from_db()
+        self.item2.refresh_from_db()
+        self.assertTrue(self.item1.is_active)
+        self.assertFalse(self.item2.is_active)
+
+        res = self.post(token, 'client_space:item_bulk_active', {"ids": [self.item1.pk], "is_active": "yes"})
+        self.assertEquals(res.status_code, 400)
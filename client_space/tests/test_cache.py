@@ -0,0 +1,43 @@
+import json
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+
+from client_space.cache import item_file_cache
+from client_space.models import Client, Item, ItemFile
+
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+class ItemFileCacheTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        item_file_cache.clear()
+        client = Client.objects.create(name="Client1")
+        item = Item.objects.create(client=client, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)))
+        self.item_file = ItemFile.objects.create(item=item, image='img/img1.png')
+
+    def test_resolve_cached(self):
+        """Resolved paths are served from the cache"""
+        self.assertEquals(item_file_cache.resolve({'img/img1.png', 'img/unknown.png'}), {'img/img1.png': self.item_file.pk})
+        with self.assertNumQueries(0):
+            self.assertEquals(item_file_cache.resolve({'img/img1.png'}), {'img/img1.png': self.item_file.pk})
+
+    def test_invalidate_on_delete(self):
+        """Deleted item files are dropped from the cache"""
+        item_file_cache.resolve({'img/img1.png'})
+        self.item_file.delete()
+        self.assertEquals(item_file_cache.resolve({'img/img1.png'}), {})
+
+    def test_resolve_shared(self):
+        """A path shared by several items resolves to the only active one of them"""
+        other_client = Client.objects.create(name="Client2")
+        other_item = Item.objects.create(client=other_client, name="Item1", areas=self.item_file.item.areas)
+        other = ItemFile.objects.create(item=other_item, image='img/img1.png')
+        self.assertEquals(item_file_cache.resolve({'img/img1.png'}), {})
+
+        Item.objects.filter(pk=other_item.pk).update(is_active=True)
+        self.assertEquals(item_file_cache.resolve({'img/img1.png'}), {'img/img1.png': other.pk})
+        Item.objects.filter(pk=self.item_file.item_id).update(is_active=True)
+        self.assertEquals(item_file_cache.resolve({'img/img1.png'}), {})
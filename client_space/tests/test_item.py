@@ -20,11 +20,13 @@ import os
 
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 
-from client_space.models import Client, ClientUser, Item
+from client_space.models import Client, ClientUser, Item, ItemFile
 
 test_user = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
 
@@ -107,6 +109,52 @@ class ItemTests(TestCase):
         self.assertEquals(data['count'], 2)
         self.assertTrue((data['data'][0]['name'] == "Item1") or (data['data'][1]['name'] == "Item1"))
 
+    def test_get_items_queries(self):
+        """Number of queries does not depend on the page size"""
+        token = self.get_token()
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(reverse('client_space:item'),
+                                      content_type='application/json',
+                                      HTTP_AUTHORIZATION=f'Bearer {token}'
+                                      )
+            self.assertEquals(res.status_code, 200)
+            return len(res.json()['data']), len(queries)
+
+        items_before, queries_before = count_queries()
+        item = Item.objects.get(client__name="Client1", name="Item1")
+        client = Client.objects.get(name="Client1")
+        for i in range(5):
+            new_item = Item.objects.create(client=client, name=f'Item{i + 10}', areas=item.areas)
+            ItemFile.objects.create(item=new_item, image=f'img/{i}_1.png', md5=f'{i}1')
+            ItemFile.objects.create(item=new_item, image=f'img/{i}_2.png', md5=f'{i}2')
+        items_after, queries_after = count_queries()
+
+        self.assertEquals(items_after, items_before + 5)
+        self.assertEquals(queries_after, queries_before)
+
+    def test_get_items_fields(self):
+        """Only requested fields are loaded"""
+        token = self.get_token()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('client_space:item'), data={'fields': ['id', 'name']},
+                                  HTTP_AUTHORIZATION=f'Bearer {token}'
+                                  )
+        self.assertEquals(res.status_code, 200)
+        data = res.json()['data']
+        self.assertEquals(sorted(item['name'] for item in data), ['Item1', 'Item2'])
+        self.assertEquals(set(data[0].keys()), {'id', 'name'})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"areas"', sql)
+        self.assertNotIn('client_space_itemfile', sql)
+
+        res = self.client.get(reverse('client_space:item'), data={'fields': ['client', 'images', 'unknown']},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(res.json()['data'][0], {'client': 'Client1', 'images': [], 'unknown': None})
+
     def test_get_items_unauthorized(self):
         """Check unauthorized access to Item"""
         res = self.client.get(reverse('client_space:item', ),
@@ -200,6 +248,68 @@ class ItemTests(TestCase):
         self.assertEquals(data2['count'], 2)
         self.assertEquals(len(data2['data']), 2)
 
+    def test_get_items_with_cursor(self):
+        """Items are paged by cursor, count is returned on request"""
+        token = self.get_token()
+        res = self.client.get(reverse('client_space:item'), data={'page_size': 1, 'cursor': ''},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 200)
+        data = res.json()
+        self.assertNotIn('count', data)
+        self.assertEquals(data['data'][0]['name'], 'Item1')
+        self.assertIsNotNone(data['next'])
+
+        res = self.client.get(reverse('client_space:item'), data={'page_size': 1, 'cursor': data['next'], 'with_count': 'true'},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 200)
+        data = res.json()
+        self.assertEquals(data['count'], 2)
+        self.assertEquals(data['data'][0]['name'], 'Item2')
+        self.assertIsNone(data['next'])
+
+        res = self.client.get(reverse('client_space:item'), data={'cursor': 'wrong'},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 400)
+
+    def test_get_item_not_modified(self):
+        """Item and items answer If-None-Match with 304 until the item changes"""
+        token = self.get_token()
+        item = Item.objects.get(client__name='Client1', name='Item1')
+        for url in (reverse('client_space:item', kwargs={'item_id': item.pk}), reverse('client_space:item')):
+            res = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEquals(res.status_code, 200)
+            etag = res['ETag']
+
+            res = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IF_NONE_MATCH=etag)
+            self.assertEquals(res.status_code, 304)
+            self.assertEquals(res['ETag'], etag)
+
+            item.max_rate = item.max_rate + 1
+            item.save()
+            res = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IF_NONE_MATCH=etag)
+            self.assertEquals(res.status_code, 200)
+            self.assertNotEqual(res['ETag'], etag)
+
+    def test_get_item_simplified(self):
+        """Areas are simplified and rounded on request"""
+        token = self.get_token()
+        item_id = Item.objects.get(client__name='Client1', name='Item1').pk
+        url = reverse('client_space:item', kwargs={'item_id': item_id})
+        full = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}').json()['data']['areas']
+        res = self.client.get(url, data={'simplify': 0.005, 'precision': 3}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 200)
+        areas = res.json()['data']['areas']
+        ring = areas['coordinates'][0][0]
+        self.assertLess(len(ring), len(full['coordinates'][0][0]))
+        self.assertEquals(ring[0], ring[-1])
+        self.assertTrue(all(round(c, 3) == c for position in ring for c in position))
+
+        res = self.client.get(url, data={'precision': 'wrong'}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 400)
+
     def test_create_item_ok(self):
         """request creation of a new item with correct parameters
         - get 200, check images are uploaded, check polygons are created"""
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+
+from client_space.media import media_url, media_urls, url_version
+
+
+class SigningStorage(FileSystemStorage):
+    """Storage signing URLs like S3Boto3Storage with querystring_auth"""
+    querystring_auth = True
+    querystring_expire = 3600
+
+    def __init__(self):
+        super().__init__(base_url='https://storage.example.com/')
+        self.signed = 0
+
+    def url(self, name):
+        self.signed += 1
+        return f'{super().url(name)}?Signature={self.signed}'
+
+
+class MediaTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_presigned_urls_cached(self):
+        """Presigned URLs are signed once and cached"""
+        storage = SigningStorage()
+        with mock.patch('client_space.media.default_storage', storage):
+            urls = media_urls(['blobs/ab/ab.mp4', 'img/1.png'])
+            self.assertEquals(urls, ['https://storage.example.com/blobs/ab/ab.mp4?Signature=1',
+                                     'https://storage.example.com/img/1.png?Signature=2'])
+            self.assertEquals(media_urls(['img/1.png', 'blobs/ab/ab.mp4']), urls[::-1])
+            self.assertEquals(storage.signed, 2)
+
+            with override_settings(MEDIA_URL_EXPIRY_MARGIN=3600):
+                self.assertEquals(media_url('img/2.png'), 'https://storage.example.com/img/2.png?Signature=3')
+                self.assertEquals(media_url('img/2.png'), 'https://storage.example.com/img/2.png?Signature=4')
+
+    @override_settings(MEDIA_CDN_URL='https://cdn.example.com/')
+    def test_cdn_urls(self):
+        """CDN URLs are built without the storage"""
+        self.assertEquals(media_url('img/a b.png'), 'https://cdn.example.com/img/a%20b.png')
+
+    @override_settings(MEDIA_URL_EXPIRY_MARGIN=600)
+    def test_url_version(self):
+        """URL version changes with the period of cached presigned URLs, stable URLs keep version 0"""
+        self.assertEquals(url_version(), 0)
+        with mock.patch('client_space.media.default_storage', SigningStorage()), mock.patch('client_space.media.time') as time:
+            time.time.return_value = 3000 * 10
+            self.assertEquals(url_version(), 10)
+            time.time.return_value = 3000 * 11 - 1
+            self.assertEquals(url_version(), 10)
+            time.time.return_value = 3000 * 11
+            self.assertEquals(url_version(), 11)
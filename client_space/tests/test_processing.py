@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from client_space import processing
+from client_space.models import Client, Item, ItemFile, ManifestFile, Rendition
+
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+media_root = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=media_root, MEDIA_THUMBNAIL_SIZE=100, MEDIA_RENDITION_WIDTH=640, MEDIA_RENDITION_HEIGHT=360)
+class ProcessingTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        client = Client.objects.create(name="Client1")
+        self.items = [Item.objects.create(client=client, name=name, areas=GEOSGeometry(json.dumps(test_areas)))
+                      for name in ("Item1", "Item2")]
+        with open(os.path.join('client_space', 'tests', 'tested.png'), 'rb') as f:
+            self.content = f.read()
+
+    def process(self):
+        return [processing.process_item_file(item_file_id) for item_file_id in processing.claim(10)]
+
+    def test_process_image(self):
+        """Images get metadata, a thumbnail and a screen rendition shared by item files with the same content"""
+        first = ItemFile.objects.create(item=self.items[0], image=SimpleUploadedFile("tested.png", self.content))
+        self.assertEquals(first.status, ItemFile.Statuses.PENDING)
+        self.assertEquals(self.process(), [ItemFile.Statuses.READY])
+
+        first.refresh_from_db()
+        self.assertEquals((first.metadata['type'], first.metadata['width'], first.metadata['height']), ('image', 2624, 1745))
+        renditions = {r.kind: r for r in first.renditions.all()}
+        self.assertEquals(max(renditions['thumbnail'].width, renditions['thumbnail'].height), 100)
+        self.assertEquals((renditions['screen'].width, renditions['screen'].height), (541, 360))
+        self.assertTrue(renditions['screen'].file.storage.exists(renditions['screen'].file.name))
+        self.assertEquals(set(ManifestFile.objects.get(item_file_id=first.pk).renditions), {'thumbnail', 'screen'})
+
+        second = ItemFile.objects.create(item=self.items[1], image=SimpleUploadedFile("copy.png", self.content))
+        self.assertEquals(self.process(), [ItemFile.Statuses.READY])
+        self.assertEquals(sorted(second.renditions.values_list('file', flat=True)),
+                          sorted(r.file.name for r in renditions.values()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(renditions['screen'].file.storage.exists(renditions['screen'].file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(renditions['screen'].file.storage.exists(renditions['screen'].file.name))
+        self.assertFalse(Rendition.objects.exists())
+
+    def test_process_wrong_file(self):
+        """Files which are neither images nor videos fail"""
+        item_file = ItemFile.objects.create(item=self.items[0], image=SimpleUploadedFile("notes.txt", b'not a media file'))
+        self.assertEquals(self.process(), [ItemFile.Statuses.FAILED])
+        item_file.refresh_from_db()
+        self.assertTrue(item_file.metadata['error'])
+        self.assertEquals(self.process(), [])
@@ -0,0 +1,87 @@
+import datetime
+import json
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from client_space.models import Client, ClientUser, Item, ItemFile
+from logger.models import Log, ModuleDailyShows, VideoModule
+
+test_user = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+
+        cl1 = Client.objects.create(name="Client1")
+        clu, _ = ClientUser.objects.get_or_create(user=new_user)
+        clu.client.add(cl1)
+        clu.save()
+
+        self.item = Item.objects.create(client=cl1, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)))
+        item_file = ItemFile.objects.create(item=self.item, image='img/img1.png')
+
+        module_user = User.objects.create(username="svcModule1", email="module1@example.com")
+        self.module = VideoModule.objects.create(user=module_user, name="Module1")
+        self.day = datetime.datetime(2022, 1, 8, 18, tzinfo=datetime.timezone.utc)
+        for minutes in (0, 10, 70):
+            Log.objects.create(module=self.module, timestamp=self.day + datetime.timedelta(minutes=minutes),
+                               point=Point(37.60200012009591, 55.753318768941305), event=Log.Events.SHOW, item_file=item_file)
+        Log.objects.create(module=self.module, timestamp=self.day, point=Point(37.60200012009591, 55.753318768941305),
+                           event=Log.Events.START)
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def test_get_item_stats(self):
+        """Shows are counted once per log by hour and by day"""
+        # the first run takes the bound of logs safe to include, the next ones include them once
+        call_command('rollup_logs')
+        call_command('rollup_logs')
+        call_command('rollup_logs')
+        token = self.get_token()
+
+        res = self.client.get(reverse('client_space:item_stats', kwargs={'item_id': self.item.pk}),
+                              data={'start': '2022-01-08', 'end': '2022-01-08', 'granularity': 'hour'},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals([row['shows'] for row in res.json()['data']], [2, 1])
+
+        res = self.client.get(reverse('client_space:item_stats', kwargs={'item_id': self.item.pk}),
+                              data={'start': '2022-01-08', 'end': '2022-01-09'},
+                              HTTP_AUTHORIZATION=f'Bearer {token}'
+                              )
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(res.json()['data'], [{"time": "2022-01-08", "shows": 3}])
+        self.assertEquals(ModuleDailyShows.objects.get(module=self.module).shows, 3)
+
+    def test_get_item_stats_wrong_dates(self):
+        """Malformed dates are rejected"""
+        token = self.get_token()
+        for data in ({'start': '2022-13-08'}, {'end': 'yesterday'}, {'start': '2022-01-09', 'end': '2022-01-08'}):
+            res = self.client.get(reverse('client_space:item_stats', kwargs={'item_id': self.item.pk}),
+                                  data=data,
+                                  HTTP_AUTHORIZATION=f'Bearer {token}'
+                                  )
+            self.assertEquals(res.status_code, 400)
+            self.assertTrue(res.json()['errors'])
@@ -0,0 +1,94 @@
+import json
+import math
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.urls import reverse
+
+from client_space.models import Client, ClientUser, Item
+from client_space.tiles import invalidate_tiles, tile_generation
+
+test_user = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+def tile_of(lon: float, lat: float, z: int) -> tuple:
+    """Tile containing the point"""
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+class TileTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+
+        cl1 = Client.objects.create(name="Client1")
+        cl2 = Client.objects.create(name="Client2")
+        clu, _ = ClientUser.objects.get_or_create(user=new_user)
+        clu.client.add(cl1)
+        clu.save()
+
+        self.item = Item.objects.create(client=cl1, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)))
+        Item.objects.create(client=cl2, name="Item2", areas=GEOSGeometry(json.dumps(test_areas)))
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def get_tile(self, token, z, x, y):
+        return self.client.get(reverse('client_space:tile', kwargs={'z': z, 'x': x, 'y': y}),
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+    def test_tile_ok(self):
+        """Tile with items of the user is returned, empty tiles have no content"""
+        token = self.get_token()
+        x, y = tile_of(37.605, 55.751, 12)
+
+        res = self.get_tile(token, 12, x, y)
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(res['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(res.content)
+
+        res = self.get_tile(token, 12, 0, 0)
+        self.assertEquals(res.status_code, 204)
+
+    def test_tile_invalidated(self):
+        """Cached tiles are dropped when items change"""
+        token = self.get_token()
+        x, y = tile_of(37.605, 55.751, 12)
+        self.assertEquals(self.get_tile(token, 12, x, y).status_code, 200)
+
+        self.item.delete()
+        self.assertEquals(self.get_tile(token, 12, x, y).status_code, 204)
+
+    def test_generation_shared(self):
+        """The generation of tiles is kept in the database for all processes"""
+        invalidate_tiles()
+        generation = tile_generation()
+        invalidate_tiles()
+        self.assertEquals(tile_generation(), generation + 1)
+
+    def test_tile_wrong(self):
+        """Tiles out of the zoom range are not found, anonymous users are not authorized"""
+        token = self.get_token()
+        self.assertEquals(self.get_tile(token, 2, 4, 0).status_code, 404)
+        self.assertEquals(self.get_tile(token, 23, 0, 0).status_code, 404)
+        res = self.client.get(reverse('client_space:tile', kwargs={'z': 0, 'x': 0, 'y': 0}))
+        self.assertEquals(res.status_code, 401)
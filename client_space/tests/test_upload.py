@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from client_space.models import Client, ClientUser, Item, ItemFile, UploadSession
+
+test_user = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+media_root = tempfile.mkdtemp()
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=1024, UPLOAD_STAGING_DIR=os.path.join(media_root, 'uploads'), MEDIA_ROOT=media_root)
+class UploadTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+
+        cl1 = Client.objects.create(name="Client1")
+        clu, _ = ClientUser.objects.get_or_create(user=new_user)
+        clu.client.add(cl1)
+        clu.save()
+
+        self.item = Item.objects.create(client=cl1, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)))
+        self.content = os.urandom(2500)
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def start(self, token, item=None, **data):
+        res = self.client.post(reverse('client_space:upload', kwargs={'item_id': (item or self.item).pk}),
+                               data={"filename": "video.mp4", "size": len(self.content), **data},
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 201)
+        return res.json()['data']
+
+    def put_chunk(self, token, session_id, offset, data, item=None):
+        url = reverse('client_space:upload', kwargs={'item_id': (item or self.item).pk, 'session_id': session_id})
+        return self.client.put(f'{url}?offset={offset}', data=data, content_type='application/octet-stream',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+    def complete(self, token, session_id, item=None):
+        return self.client.post(reverse('client_space:upload_complete', kwargs={'item_id': (item or self.item).pk, 'session_id': session_id}),
+                                HTTP_AUTHORIZATION=f'Bearer {token}'
+                                )
+
+    def test_upload_ok(self):
+        """File is uploaded in chunks, chunks can be retried, the md5 is of the whole file"""
+        token = self.get_token()
+        session = self.start(token)
+        self.assertEquals(session['chunk_size'], 1024)
+
+        self.assertEquals(self.put_chunk(token, session['id'], 0, self.content[:1024]).status_code, 200)
+        # a retried chunk must have the same content
+        self.assertEquals(self.put_chunk(token, session['id'], 0, self.content[1024:2048]).status_code, 409)
+        self.assertEquals(self.put_chunk(token, session['id'], 2048, self.content[2048:]).status_code, 409)
+        self.assertEquals(self.complete(token, session['id']).status_code, 409)
+        self.assertEquals(self.put_chunk(token, session['id'], 1024, self.content[1024:2048]).status_code, 200)
+        with self.settings(UPLOAD_CHUNK_SIZE=2048):
+            # the upload keeps its chunk size
+            self.assertEquals(self.put_chunk(token, session['id'], 1024, self.content[1024:2048]).status_code, 200)
+        res = self.put_chunk(token, session['id'], 2048, self.content[2048:])
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(res.json()['data']['received'], len(self.content))
+
+        res = self.complete(token, session['id'])
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(len(res.json()['data']['images']), 1)
+        item_file = ItemFile.objects.get(item=self.item)
+        with item_file.image.open('rb') as f:
+            self.assertEquals(f.read(), self.content)
+        self.assertEquals(item_file.md5, hashlib.md5(self.content).hexdigest())
+        self.assertEquals(item_file.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertFalse(UploadSession.objects.exists())
+
+        # the same file again is not added
+        session = self.start(token)
+        for offset in range(0, len(self.content), 1024):
+            self.put_chunk(token, session['id'], offset, self.content[offset:offset + 1024])
+        self.assertEquals(self.complete(token, session['id']).status_code, 200)
+        self.assertEquals(ItemFile.objects.filter(item=self.item).count(), 1)
+
+    def test_upload_wrong_chunk(self):
+        """Chunks of wrong size or offset are rejected, uploads can be aborted"""
+        token = self.get_token()
+        session = self.start(token)
+        self.assertEquals(self.put_chunk(token, session['id'], 0, self.content[:1000]).status_code, 400)
+        self.assertEquals(self.put_chunk(token, session['id'], 10, self.content[:1024]).status_code, 400)
+
+        url = reverse('client_space:upload', kwargs={'item_id': self.item.pk, 'session_id': session['id']})
+        res = self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 404)
+
+    def test_shared_file(self):
+        """Items with the same file share the stored file, it is deleted after the last item file is deleted"""
+        token = self.get_token()
+        item2 = Item.objects.create(client=self.item.client, name="Item2", areas=self.item.areas)
+        first = ItemFile(item=self.item, image=SimpleUploadedFile("video.mp4", self.content))
+        first.save()
+        self.assertTrue(first.image.name.startswith(f'blobs/{first.sha256[:2]}/{first.sha256}'))
+
+        res = self.client.post(reverse('client_space:upload', kwargs={'item_id': item2.pk}),
+                               data={"filename": "video.mp4", "size": len(self.content), "md5": first.md5},
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 200)
+        second = ItemFile.objects.get(item=item2)
+        self.assertEquals(second.image.name, first.image.name)
+        self.assertFalse(UploadSession.objects.exists())
+
+        storage = first.image.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+            self.assertTrue(storage.exists(second.image.name))
+            # the file is attached again before the deletion is committed
+            third = ItemFile.objects.create(item=self.item, image=second.image.name, md5=second.md5, sha256=second.sha256)
+        self.assertTrue(storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            third.delete()
+        self.assertFalse(storage.exists(second.image.name))
+
+    def test_shared_file_of_other_client(self):
+        """Files of other clients are not added by md5, uploaded files with the same sha256 share the stored file"""
+        token = self.get_token()
+        first = ItemFile(item=self.item, image=SimpleUploadedFile("video.mp4", self.content))
+        first.save()
+        other_client = Client.objects.create(name="Client2")
+        ClientUser.objects.get(user__username=test_user["username"]).client.add(other_client)
+        other_item = Item.objects.create(client=other_client, name="Item1", areas=self.item.areas)
+
+        session = self.start(token, other_item, md5=first.md5)
+        self.assertFalse(ItemFile.objects.filter(item=other_item).exists())
+        for offset in range(0, len(self.content), 1024):
+            self.put_chunk(token, session['id'], offset, self.content[offset:offset + 1024], other_item)
+        self.assertEquals(self.complete(token, session['id'], other_item).status_code, 200)
+        second = ItemFile.objects.get(item=other_item)
+        self.assertEquals((second.image.name, second.sha256), (first.image.name, first.sha256))
+        self.assertFalse(first.image.storage.exists(session['path']))
+
+    def test_upload_keeps_stored_files(self):
+        """Uploads are staged under their own names and never replace stored files"""
+        token = self.get_token()
+        # a file stored before the content-addressed names
+        storage = ItemFile._meta.get_field('image').storage
+        storage.save('images/Client1/Item1/video.mp4', SimpleUploadedFile("video.mp4", b'stored'))
+        ItemFile.objects.create(item=self.item, image='images/Client1/Item1/video.mp4',
+                                md5=hashlib.md5(b'stored').hexdigest(), sha256=hashlib.sha256(b'stored').hexdigest())
+
+        session = self.start(token)
+        self.assertTrue(session['path'].startswith('uploads/'))
+        for offset in range(0, len(self.content), 1024):
+            self.put_chunk(token, session['id'], offset, self.content[offset:offset + 1024])
+        self.assertEquals(self.complete(token, session['id']).status_code, 200)
+
+        with storage.open('images/Client1/Item1/video.mp4', 'rb') as f:
+            self.assertEquals(f.read(), b'stored')
+        uploaded = ItemFile.objects.get(item=self.item, sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertTrue(uploaded.image.name.startswith('blobs/'))
+
+    def test_md5_computed_on_upload(self):
+        """Uploaded files are hashed once while they are received, stored files are not hashed again"""
+        token = self.get_token()
+        with mock.patch('client_space.models.file_digests') as model_digests, mock.patch('client_space.api_views.item.file_md5') as view_md5:
+            res = APIClient().put(reverse('client_space:image', kwargs={"item_id": self.item.pk}),
+                                  data={"image": [SimpleUploadedFile("video.mp4", self.content)]},
+                                  HTTP_AUTHORIZATION=f'Bearer {token}'
+                                  )
+            self.assertEquals(res.status_code, 200)
+            item_file = ItemFile.objects.get(item=self.item)
+            item_file.save()
+            model_digests.assert_not_called()
+            view_md5.assert_not_called()
+        self.assertEquals(item_file.md5, hashlib.md5(self.content).hexdigest())
+        self.assertEquals(item_file.sha256, hashlib.sha256(self.content).hexdigest())
+
+    def test_backfill_digests(self):
+        """Stored files saved before the digests were kept are hashed by the command, not on every save"""
+        storage = ItemFile._meta.get_field('image').storage
+        name = storage.save('images/Client1/Item1/video.mp4', SimpleUploadedFile("video.mp4", self.content))
+        item2 = Item.objects.create(client=self.item.client, name="Item2", areas=self.item.areas)
+        first = ItemFile.objects.create(item=self.item, image=name)
+        ItemFile.objects.create(item=item2, image=name, md5=hashlib.md5(self.content).hexdigest())
+        first.save()
+        self.assertEquals(ItemFile.objects.get(pk=first.pk).sha256, '')
+
+        call_command('backfill_digests', batch_size=1)
+
+        self.assertEquals(set(ItemFile.objects.values_list('md5', 'sha256')),
+                          {(hashlib.md5(self.content).hexdigest(), hashlib.sha256(self.content).hexdigest())})
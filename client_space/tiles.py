@@ -0,0 +1,47 @@
+"""
+Cached vector tiles of items areas.
+Tiles are cached by the generation of items, which is kept in the database, so that a change of items
+in one process drops the tiles cached by all processes
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+GENERATION_NAME = 'item_tiles'
+
+
+def tile_generation() -> int:
+    """Current generation of items tiles, read once per tile so that the tile is cached by the generation it is made of"""
+    from client_space.models import CacheGeneration
+
+    return CacheGeneration.objects.filter(name=GENERATION_NAME).values_list('generation', flat=True).first() or 0
+
+
+def _key(generation: int, client_ids, z: int, x: int, y: int) -> str:
+    clients = ','.join(str(client_id) for client_id in sorted(client_ids))
+    return f'item_tiles:{generation}:{clients}:{z}/{x}/{y}'
+
+
+def get_tile(generation: int, client_ids, z: int, x: int, y: int):
+    """Cached tile of items of the clients, None if not cached"""
+    return cache.get(_key(generation, client_ids, z, x, y))
+
+
+def set_tile(generation: int, client_ids, z: int, x: int, y: int, tile: bytes):
+    """Cache the tile of items of the clients"""
+    cache.set(_key(generation, client_ids, z, x, y), tile, getattr(settings, 'TILE_CACHE_TIMEOUT', 3600))
+
+
+def invalidate_tiles():
+    """Drop all cached tiles by moving to the next generation"""
+    from client_space.models import CacheGeneration
+
+    with connection.cursor() as cursor:
+        # the first generation starts from the clock so that tiles cached before the row was created are not reused
+        cursor.execute(
+            f'INSERT INTO {CacheGeneration._meta.db_table} AS g (name, generation) VALUES (%s, %s) '
+            f'ON CONFLICT (name) DO UPDATE SET generation = g.generation + 1',
+            [GENERATION_NAME, int(time.time() * 1000)]
+        )
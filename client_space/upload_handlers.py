@@ -0,0 +1,34 @@
+"""
+Upload handlers hashing uploaded files as they are received.
+Uploaded files get the md5 and sha256 attributes with their digests, so that the digests are not computed
+by reading the file again
+"""
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from client_space.uploads import Digests
+
+
+class HashingUploadHandlerMixin:
+    def new_file(self, *args, **kwargs):
+        self.digests = Digests()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # the memory handler passes files too big for memory on to the next handler, which hashes them
+        if getattr(self, 'activated', True):
+            self.digests.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.md5, file.sha256 = self.digests.hexdigests()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    """Keep small uploaded files in memory, hashing them"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    """Stream uploaded files to temporary files, hashing them"""
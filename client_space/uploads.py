@@ -0,0 +1,245 @@
+"""
+Chunked uploads of item files.
+Files are uploaded in parts of UPLOAD_CHUNK_SIZE bytes: as S3 multipart uploads on S3 storages
+and as part files staged in UPLOAD_STAGING_DIR on other storages.
+Parts are staged under a unique name, the completed file is moved to its content-addressed name,
+so that uploads never overwrite or delete stored files.
+The part size is kept in the upload session, so that uploads in progress are not broken by a new UPLOAD_CHUNK_SIZE.
+The md5 and sha256 of an item file are digests of its whole content: parts are received in order and hashed
+as they come, the state of the digests is kept in the upload session between requests
+"""
+import ctypes
+import ctypes.util
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+READ_SIZE = 64 * 1024
+STAGING_PREFIX = 'uploads'
+
+
+def chunk_size() -> int:
+    """Size of upload parts, S3 requires at least 5 MiB for all parts but the last one"""
+    return settings.UPLOAD_CHUNK_SIZE
+
+
+def file_md5(file) -> str:
+    """Md5 of the file read part by part"""
+    md5 = hashlib.md5()
+    file.seek(0)
+    for data in iter(lambda: file.read(READ_SIZE), b''):
+        md5.update(data)
+    file.seek(0)
+    return md5.hexdigest()
+
+
+class Digests:
+    """Md5 and sha256 of data hashed in one pass"""
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def update(self, data: bytes):
+        self.md5.update(data)
+        self.sha256.update(data)
+
+    def hexdigests(self) -> tuple:
+        return self.md5.hexdigest(), self.sha256.hexdigest()
+
+
+def file_digests(file) -> tuple:
+    """Md5 and sha256 of the file read part by part"""
+    digests = Digests()
+    file.seek(0)
+    for data in iter(lambda: file.read(READ_SIZE), b''):
+        digests.update(data)
+    file.seek(0)
+    return digests.hexdigests()
+
+
+@functools.lru_cache()
+def _libcrypto():
+    """OpenSSL library hashlib is built with"""
+    lib = ctypes.CDLL(ctypes.util.find_library('crypto') or 'libcrypto.so.3')
+    for algorithm, _, _ in DigestState.ALGORITHMS:
+        getattr(lib, f'{algorithm}_Init').argtypes = [ctypes.c_void_p]
+        getattr(lib, f'{algorithm}_Update').argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+        getattr(lib, f'{algorithm}_Final').argtypes = [ctypes.c_char_p, ctypes.c_void_p]
+    return lib
+
+
+class DigestState:
+    """
+    Md5 and sha256 of data hashed across requests.
+    Hashlib objects can't be saved, so OpenSSL hash contexts are used: they are plain structures
+    saved as bytes and restored by any process of the same platform
+    """
+    # algorithm, context size, digest size
+    ALGORITHMS = (('MD5', 92, 16), ('SHA256', 112, 32))
+
+    def __init__(self, state: bytes = b''):
+        lib = _libcrypto()
+        state = bytes(state)
+        self.contexts = []
+        offset = 0
+        for algorithm, size, _ in self.ALGORITHMS:
+            if state:
+                context = ctypes.create_string_buffer(state[offset:offset + size], size)
+            else:
+                context = ctypes.create_string_buffer(size)
+                getattr(lib, f'{algorithm}_Init')(context)
+            self.contexts.append(context)
+            offset += size
+
+    def update(self, data: bytes):
+        lib = _libcrypto()
+        for (algorithm, _, _), context in zip(self.ALGORITHMS, self.contexts):
+            getattr(lib, f'{algorithm}_Update')(context, data, len(data))
+
+    def state(self) -> bytes:
+        return b''.join(context.raw for context in self.contexts)
+
+    def hexdigests(self) -> tuple:
+        """Md5 and sha256 of the data hashed so far, the state is kept"""
+        lib = _libcrypto()
+        digests = []
+        for (algorithm, size, digest_size), context in zip(self.ALGORITHMS, self.contexts):
+            digest = ctypes.create_string_buffer(digest_size)
+            getattr(lib, f'{algorithm}_Final')(digest, ctypes.create_string_buffer(context.raw, size))
+            digests.append(digest.raw.hex())
+        return tuple(digests)
+
+
+def staging_name(filename: str) -> str:
+    """Unique storage name of an upload in progress"""
+    return f'{STAGING_PREFIX}/{uuid.uuid4().hex}/{filename}'
+
+
+def read_part(stream, max_size: int):
+    """
+    Read an upload part from the stream into a spooled temporary file
+    :param stream: file-like object
+    :param max_size: maximum part size
+    :return: temporary file positioned at the start, size. Size is max_size + 1 if the part is too big
+    """
+    part = tempfile.SpooledTemporaryFile(max_size=READ_SIZE * 16)
+    size = 0
+    while size <= max_size:
+        data = stream.read(min(READ_SIZE, max_size + 1 - size))
+        if not data:
+            break
+        part.write(data)
+        size += len(data)
+    part.seek(0)
+    return part, size
+
+
+class LocalMultipartUpload:
+    """Parts staged as files in UPLOAD_STAGING_DIR and saved to the storage on completion"""
+
+    def __init__(self, storage, name: str, upload_id: str):
+        self.storage = storage
+        self.name = name
+        self.upload_id = upload_id
+        self.directory = os.path.join(settings.UPLOAD_STAGING_DIR, upload_id)
+
+    @classmethod
+    def start(cls, storage, name: str):
+        upload = cls(storage, name, uuid.uuid4().hex)
+        os.makedirs(upload.directory)
+        return upload
+
+    def upload_part(self, number: int, part) -> str:
+        with open(os.path.join(self.directory, str(number)), 'wb') as f:
+            shutil.copyfileobj(part, f)
+        return str(number)
+
+    def complete(self, parts: list, name: str) -> str:
+        """
+        Save the parts to the storage
+        :param parts: uploaded parts in order
+        :param name: name of the stored file
+        :return: name of the saved file
+        """
+        with tempfile.TemporaryFile(dir=self.directory) as content:
+            for part in parts:
+                with open(os.path.join(self.directory, str(part["number"])), 'rb') as f:
+                    shutil.copyfileobj(f, content)
+            content.seek(0)
+            name = self.storage.save(name, File(content, name=os.path.basename(name)))
+        self.abort()
+        return name
+
+    def abort(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class S3MultipartUpload:
+    """S3 multipart upload, parts are sent to S3 as they come"""
+
+    def __init__(self, storage, name: str, upload_id: str):
+        self.storage = storage
+        self.name = name
+        self.upload_id = upload_id
+        self.key = storage._normalize_name(storage._clean_name(name))
+        self.client = storage.connection.meta.client
+
+    @classmethod
+    def start(cls, storage, name: str):
+        upload = cls(storage, name, '')
+        response = upload.client.create_multipart_upload(Bucket=storage.bucket_name, Key=upload.key,
+                                                         **storage._get_write_parameters(upload.key))
+        upload.upload_id = response['UploadId']
+        return upload
+
+    def upload_part(self, number: int, part) -> str:
+        response = self.client.upload_part(Bucket=self.storage.bucket_name, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=part)
+        return response['ETag']
+
+    def complete(self, parts: list, name: str) -> str:
+        """
+        Complete the upload of the staged object and move it to the stored file name in S3
+        :param parts: uploaded parts in order
+        :param name: name of the stored file
+        :return: name of the saved file
+        """
+        bucket = self.storage.bucket_name
+        self.client.complete_multipart_upload(
+            Bucket=bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': [{'ETag': part["etag"], 'PartNumber': part["number"]} for part in parts]}
+        )
+        key = self.storage._normalize_name(self.storage._clean_name(name))
+        self.client.copy({'Bucket': bucket, 'Key': self.key}, bucket, key,
+                         ExtraArgs={**self.storage._get_write_parameters(key), 'MetadataDirective': 'REPLACE'})
+        self.client.delete_object(Bucket=bucket, Key=self.key)
+        return self.storage._clean_name(name)
+
+    def abort(self):
+        self.client.abort_multipart_upload(Bucket=self.storage.bucket_name, Key=self.key, UploadId=self.upload_id)
+
+
+def _upload_class(storage):
+    try:
+        from storages.backends.s3boto3 import S3Boto3Storage
+    except ImportError:
+        return LocalMultipartUpload
+    return S3MultipartUpload if isinstance(storage, S3Boto3Storage) else LocalMultipartUpload
+
+
+def start_upload(name: str):
+    """Start a multipart upload of the file to the default storage"""
+    return _upload_class(default_storage).start(default_storage, name)
+
+
+def get_upload(name: str, upload_id: str):
+    """Multipart upload started by start_upload"""
+    return _upload_class(default_storage)(default_storage, name, upload_id)
@@ -17,7 +17,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from . import views
-from .api_views import client, item
+from .api_views import bulk, client, item, stats, tiles, upload
 from .api_views.auth import EmailTokenObtainPairView, user
 
 app_name = 'client_space'
@@ -36,5 +36,14 @@ urlpatterns = [
     # item
     path('item/', item.items, name='item'),
     path('item/<int:item_id>', item.item, name='item'),
+    path('item/bulk', bulk.items_bulk, name='item_bulk'),
+    path('item/bulk/active', bulk.items_bulk_active, name='item_bulk_active'),
     path('item/<int:item_id>/image', item.image, name='image'),
+    path('item/<int:item_id>/upload', upload.uploads, name='upload'),
+    path('item/<int:item_id>/upload/<int:session_id>', upload.upload, name='upload'),
+    path('item/<int:item_id>/upload/<int:session_id>/complete', upload.complete, name='upload_complete'),
+    path('item/<int:item_id>/stats', stats.item_stats, name='item_stats'),
+
+    # tiles
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', tiles.tile, name='tile'),
 ]
@@ -0,0 +1,38 @@
+import json
+
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.item_index import active_item_index
+from logger.models import VideoModule
+from logger.spend import spend_tracker
+from xside_server.responses import JsonResponse
+
+
+@extend_schema(exclude=True, )
+@api_view(['POST', ])
+def decision(request):
+    """
+    POST current point of a video module, get active items to show there
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        request.user.videomodule
+    except VideoModule.DoesNotExist:
+        return JsonResponse({"detail": "Not videomodule"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        point = GEOSGeometry(json.dumps(request.data['point']))
+        if point.geom_type != 'Point':
+            raise ValueError(f'Expected Point, got {point.geom_type}')
+    except (KeyError, GDALException, GEOSException, TypeError, ValueError):
+        return JsonResponse({"errors": [{"point": "Expected Point in GeoJSON format"}]}, status=status.HTTP_400_BAD_REQUEST)
+
+    items = [item for item in active_item_index.lookup(point) if spend_tracker.within_budget(item["id"])]
+    return JsonResponse({"data": items}, status=status.HTTP_200_OK)
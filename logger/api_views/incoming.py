@@ -1,22 +1,17 @@
-import json
-
-from django.contrib.auth.models import User
-from django.contrib.gis.geos import GEOSGeometry
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import DatabaseError
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.decorators import api_view
 
-from client_space.models import ItemFile
-from logger.models import Log, VideoModule
+from logger import spool
+from logger.ingestion import copy_features, insert_logs, parse_features
+from logger.models import VideoModule
+from xside_server.responses import JsonResponse
 
 MAX_PAGE_SIZE = 100
 
 
-class ParsingError(Exception):
-    pass
-
-
 @extend_schema(exclude=True, )
 @api_view(['POST', ])
 def logs(request):
@@ -28,40 +23,75 @@ def logs(request):
         return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
     if request.method == "POST":
-        log = Log()
-        return save_log(request, log, status.HTTP_201_CREATED)
+        return save_log(request, status.HTTP_201_CREATED)
 
     return JsonResponse({"detail": "Wrong method"}, status=status.HTTP_501_NOT_IMPLEMENTED)
 
 
-def save_log(request, log, success_status):
+@extend_schema(exclude=True, )
+@api_view(['POST', ])
+def logs_stream(request):
+    """
+    POST newline-delimited GeoJSON features from video modules.
+    The body is streamed into the database without being loaded into memory
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    if request.method == "POST":
+        return copy_log(request, status.HTTP_201_CREATED)
+
+    return JsonResponse({"detail": "Wrong method"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+
+def save_log(request, success_status):
+    """
+    Validate the whole feature collection and write all logs in one transaction
+    or put them into the log spool if asynchronous ingestion is enabled
+    :return: errors with indexes of the wrong features if any feature is incorrect
+    """
     try:
         videomodule = request.user.videomodule
     except VideoModule.DoesNotExist:
         return JsonResponse({"detail": "Not videomodule"}, status=status.HTTP_403_FORBIDDEN)
 
-    if not "features" in request.data.keys():
+    if not "features" in request.data.keys() or not isinstance(request.data['features'], list):
         return JsonResponse({"detail": "Feature collection not found"}, status=status.HTTP_400_BAD_REQUEST)
 
-    for f in request.data['features']:
-        try:
-            event = f['properties']['event']
-            item_file = f['properties']['item_file']
-            data = json.loads(f['properties']['data']) if f['properties']['data'] is not None else None
-            ts = f['properties']['timestamp']
-            point = GEOSGeometry(json.dumps(f['geometry']))
-        except KeyError:
-            return JsonResponse({"detail": "Bad request"}, status=status.HTTP_400_BAD_REQUEST)
+    logs, errors = parse_features(request.data['features'], videomodule)
+    if errors:
+        return JsonResponse({"detail": "Incorrect data", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
 
+    if settings.LOG_INGESTION_ASYNC:
         try:
-            log.module = videomodule
-            log.timestamp = ts
-            log.point = point
-            log.event = event
-            log.item_file = ItemFile.objects.get(image=item_file) if item_file else None
-            log.data = data
-            log.save()
-        except Exception:
-            return JsonResponse({"detail": "Incorrect data"}, status=status.HTTP_400_BAD_REQUEST)
-
-    return JsonResponse({"data": "OK"}, status=success_status)
+            count = spool.enqueue(logs)
+        except OSError:
+            return JsonResponse({"detail": "Log spool is not available"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return JsonResponse({"data": "Accepted", "count": count}, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        count = insert_logs(logs)
+    except Exception:
+        return JsonResponse({"detail": "Incorrect data"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return JsonResponse({"data": "OK", "count": count}, status=success_status)
+
+
+def copy_log(request, success_status):
+    """
+    Validate streamed features line by line and copy the correct ones into the database
+    :return: numbers of accepted, duplicated and rejected features and errors with line indexes
+    """
+    try:
+        videomodule = request.user.videomodule
+    except VideoModule.DoesNotExist:
+        return JsonResponse({"detail": "Not videomodule"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        accepted, duplicates, rejected, errors = copy_features(request.stream or [], videomodule)
+    except DatabaseError:
+        return JsonResponse({"detail": "Incorrect data"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return JsonResponse({"accepted": accepted, "duplicates": duplicates, "rejected": rejected, "errors": errors},
+                        status=success_status)
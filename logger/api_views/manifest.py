@@ -0,0 +1,82 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.decorators import api_view
+
+from client_space.manifest import listed_files, manifest_changes
+from client_space.media import media_urls
+from logger.models import VideoModule
+from xside_server.responses import JsonResponse
+
+# maximum number of item files requested by ids
+MAX_MANIFEST_IDS = 1000
+
+
+def serialize_manifest_files(entries):
+    """Manifest files with URLs of the files and their renditions"""
+    paths = [entry.path for entry in entries]
+    paths += [rendition["path"] for entry in entries for rendition in entry.renditions.values()]
+    urls = dict(zip(paths, media_urls(paths)))
+    return [{
+        "id": entry.item_file_id,
+        "item": entry.item_id,
+        "md5": entry.md5,
+        "size": entry.size,
+        "url": urls[entry.path],
+        "renditions": {kind: {"url": urls[rendition["path"]], "content_type": rendition["content_type"],
+                              "width": rendition["width"], "height": rendition["height"], "size": rendition["size"]}
+                       for kind, rendition in entry.renditions.items()},
+    } for entry in entries]
+
+
+@extend_schema(exclude=True, )
+@api_view(['GET', ])
+def manifest(request):
+    """
+    GET item files a video module should keep locally.
+    With since=<version> of the last sync only files changed after it are returned:
+    files to download and ids of item files to drop.
+    Files have renditions fitting the screens once they are processed.
+    URLs expire, with ids=<id>,<id>,... listed files of the item files are returned with new URLs
+    :return:
+    """
+    if request.user.is_anonymous:
+        return JsonResponse({"detail": "Not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        request.user.videomodule
+    except VideoModule.DoesNotExist:
+        return JsonResponse({"detail": "Not videomodule"}, status=status.HTTP_403_FORBIDDEN)
+
+    ids = request.GET.get("ids")
+    if ids is not None:
+        try:
+            ids = [int(item_file_id) for item_file_id in ids.split(',')]
+            if len(ids) > MAX_MANIFEST_IDS:
+                raise ValueError('too many ids')
+        except ValueError:
+            return JsonResponse({"errors": [{"ids": f"Expected at most {MAX_MANIFEST_IDS} comma-separated item file ids"}]},
+                                status=status.HTTP_400_BAD_REQUEST)
+        version, files = listed_files(ids)
+        return JsonResponse({"version": version, "data": serialize_manifest_files(files)}, status=status.HTTP_200_OK)
+
+    since = request.GET.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError('since must not be negative')
+        except ValueError:
+            return JsonResponse({"errors": [{"since": "Expected non-negative integer"}]}, status=status.HTTP_400_BAD_REQUEST)
+
+    version, files, removed = manifest_changes(since)
+    if since is not None and since > version:
+        # the module was synced with another manifest, send it the whole one
+        since = None
+        version, files, removed = manifest_changes()
+
+    return JsonResponse({
+        "version": version,
+        "full": since is None,
+        "data": serialize_manifest_files(files),
+        "removed": removed,
+    }, status=status.HTTP_200_OK)
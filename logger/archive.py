@@ -0,0 +1,133 @@
+"""
+Cold archive of old logs.
+Logs older than the retention horizon are exported by `manage.py archive_logs` into gzip compressed
+column-oriented JSON files per module and day on the default storage and removed from the database.
+Files are never rewritten: logs of a day archived later are saved to another part file of the day,
+so that archived logs are not lost if saving a file fails
+"""
+import datetime
+import gzip
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from logger.models import Log
+
+ARCHIVE_COLUMNS = ('id', 'timestamp', 'lon', 'lat', 'event', 'item_file', 'data')
+
+
+def archive_path(module_id: int, day: datetime.date, part: str = '') -> str:
+    """Path of an archive file of a module for a day, files archived before parts were introduced have no part"""
+    return f'{settings.LOG_ARCHIVE_PREFIX}/{module_id}/{day:%Y/%m/%d}{"." + part if part else ""}.json.gz'
+
+
+def archive_parts(module_id: int, day: datetime.date) -> list:
+    """Paths of the archive files of a module for a day"""
+    path = archive_path(module_id, day)
+    directory, name = os.path.split(path)
+    prefix = name[:-len('.json.gz')] + '.'
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [f'{directory}/{file}' for file in sorted(files) if file.startswith(prefix) and file.endswith('.json.gz')]
+
+
+def _day_range(day: datetime.date):
+    start = datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc)
+    return start, start + datetime.timedelta(days=1)
+
+
+def read_archive(module_id: int, day: datetime.date) -> dict:
+    """
+    Read archived logs of a module for a day
+    :return: dict column name -> list of values, empty columns if nothing is archived
+    """
+    columns = {column: [] for column in ARCHIVE_COLUMNS}
+    for path in archive_parts(module_id, day):
+        with default_storage.open(path, 'rb') as f:
+            part = json.loads(gzip.decompress(f.read()))
+        for column in ARCHIVE_COLUMNS:
+            columns[column].extend(part[column])
+    return columns
+
+
+def archive_day(module_id: int, day: datetime.date) -> int:
+    """
+    Move logs of a module for a day from the database to the archive.
+    Logs archived earlier for the same day are kept in their files, new ones are saved to a new part
+    :return: number of archived logs
+    """
+    start, end = _day_range(day)
+    logs = Log.objects.filter(module_id=module_id, timestamp__gte=start, timestamp__lt=end).order_by('timestamp', 'id')
+    rows = list(logs.values_list('id', 'timestamp', 'point', 'event', 'item_file_id', 'data'))
+    if not rows:
+        return 0
+
+    archived_ids = set(read_archive(module_id, day)['id'])
+    columns = {column: [] for column in ARCHIVE_COLUMNS}
+    for log_id, timestamp, point, event, item_file_id, data in rows:
+        if log_id in archived_ids:
+            # archived by a run which failed to delete the logs
+            continue
+        columns['id'].append(log_id)
+        columns['timestamp'].append(timestamp.isoformat())
+        columns['lon'].append(point.x)
+        columns['lat'].append(point.y)
+        columns['event'].append(event)
+        columns['item_file'].append(item_file_id)
+        columns['data'].append(data)
+
+    if columns['id']:
+        # logs are deleted only once the new part is saved
+        path = archive_path(module_id, day, uuid.uuid4().hex)
+        default_storage.save(path, ContentFile(gzip.compress(json.dumps(columns).encode())))
+
+    with transaction.atomic():
+        Log.objects.filter(module_id=module_id, timestamp__gte=start, timestamp__lt=end,
+                           pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def archived_modules() -> list:
+    """Ids of modules having archived logs"""
+    try:
+        directories, _ = default_storage.listdir(settings.LOG_ARCHIVE_PREFIX)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in directories if name.isdigit())
+
+
+def archived_logs(start: datetime.date, end: datetime.date, module_id: int = None, event: str = None):
+    """
+    Read archived logs of the days from start to end (not included)
+    :param module_id: only logs of the module
+    :param event: only logs of the event
+    :return: generator of dicts with the log fields
+    """
+    module_ids = [module_id] if module_id is not None else archived_modules()
+    day = start
+    while day < end:
+        for module in module_ids:
+            columns = read_archive(module, day)
+            for values in zip(*(columns[column] for column in ARCHIVE_COLUMNS)):
+                row = dict(zip(ARCHIVE_COLUMNS, values))
+                if event is not None and row['event'] != event:
+                    continue
+                yield {
+                    "id": row['id'],
+                    "module": module,
+                    "timestamp": parse_datetime(row['timestamp']),
+                    "point": Point(row['lon'], row['lat'], srid=Log._meta.get_field('point').srid),
+                    "event": row['event'],
+                    "item_file": row['item_file'],
+                    "data": row['data'],
+                }
+        day += datetime.timedelta(days=1)
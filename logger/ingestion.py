@@ -0,0 +1,303 @@
+import json
+
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from client_space.cache import item_file_cache
+from client_space.models import Item, ItemFile
+from logger.models import Log
+from logger.spend import persist_spend, spend_tracker
+
+INSERT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+ITEM_FILE_NOT_FOUND = 'not found or shared by several active items, expected its id'
+
+
+class ParsingError(Exception):
+    pass
+
+
+def parse_features(features, videomodule):
+    """
+    Validate GeoJSON features sent by a video module and build unsaved logs
+    :param features: list of GeoJSON features of a FeatureCollection
+    :param videomodule: VideoModule which sent the features
+    :return: list of Log objects without repeated events and list of errors with indexes of the wrong features
+    """
+    errors = []
+    parsed = []
+    for index, feature in enumerate(features):
+        try:
+            parsed.append((index, *_parse_feature(feature, videomodule)))
+        except ParsingError as e:
+            errors.append({"index": index, "detail": str(e)})
+
+    item_files = resolve_item_files({item_file for _, _, item_file in parsed if item_file})
+
+    logs = []
+    seen = set()
+    for index, log, item_file in parsed:
+        if item_file and item_file not in item_files:
+            errors.append({"index": index, "detail": f"Item file {item_file} {ITEM_FILE_NOT_FOUND}"})
+            continue
+        key = (log.timestamp, log.event)
+        if key in seen:
+            # the same event repeated in the batch
+            continue
+        seen.add(key)
+        log.item_file_id = item_files.get(item_file)
+        logs.append(log)
+
+    errors.sort(key=lambda error: error["index"])
+    return logs, errors
+
+
+def _parse_feature(feature, videomodule):
+    """
+    Validate one GeoJSON feature
+    :param feature: GeoJSON feature
+    :param videomodule: VideoModule which sent the feature
+    :return: unsaved Log without item file and id or path of the shown item file
+    """
+    try:
+        properties = feature['properties']
+        event = properties['event']
+        item_file = properties['item_file']
+        data = properties['data']
+        ts = properties['timestamp']
+        geometry = feature['geometry']
+    except (KeyError, TypeError):
+        raise ParsingError('Feature must have geometry and event, item_file, data, timestamp properties')
+
+    if event not in Log.Events.values:
+        raise ParsingError(f'Unknown event {event}')
+
+    if isinstance(item_file, bool) or not isinstance(item_file, (int, str, type(None))):
+        raise ParsingError('Expected item_file id or path')
+
+    try:
+        timestamp = parse_datetime(ts)
+    except (TypeError, ValueError):
+        timestamp = None
+    if timestamp is None:
+        raise ParsingError(f'Cannot parse timestamp {ts}')
+
+    try:
+        point = GEOSGeometry(json.dumps(geometry))
+    except (GDALException, GEOSException, TypeError, ValueError):
+        raise ParsingError('Cannot parse geometry. Expected Point in GeoJSON format')
+    if point.geom_type != 'Point':
+        raise ParsingError(f'Expected Point, got {point.geom_type}')
+
+    try:
+        data = json.loads(data) if data is not None else None
+    except (TypeError, ValueError):
+        raise ParsingError('Cannot parse data. Expected JSON string or null')
+
+    log = Log(module=videomodule, timestamp=timestamp, point=point, event=event, data=data)
+    return log, item_file or None
+
+
+def resolve_item_files(item_files) -> dict:
+    """
+    Resolve item file ids and paths to ItemFile ids.
+    Paths are resolved using the in-process cache and one query for the paths not cached.
+    A path shared by item files of several items is resolved only if one of the items is active
+    :param item_files: set of item file ids and paths
+    :return: dict id or path -> ItemFile id for the item files found
+    """
+    paths = {item_file for item_file in item_files if isinstance(item_file, str)}
+    ids = item_files - paths
+    result = item_file_cache.resolve(paths) if paths else {}
+    if ids:
+        result.update((pk, pk) for pk in ItemFile.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    return result
+
+
+def _inserted_spend(cursor, insert_sql: str, params) -> tuple:
+    """
+    Run INSERT ... RETURNING "timestamp", event, item_file_id into the logs table
+    and sum the spend of the inserted shows, events skipped as already stored are not counted
+    :return: number of inserted logs, dict (item_id, day) -> spend
+    """
+    cursor.execute(
+        f'WITH inserted AS ({insert_sql}) '
+        f'SELECT f.item_id, (i."timestamp" AT TIME ZONE \'UTC\')::date, it.max_rate, '
+        f'count(*) FILTER (WHERE i.event = %s), count(*) '
+        f'FROM inserted i LEFT JOIN {ItemFile._meta.db_table} f ON f.id = i.item_file_id '
+        f'LEFT JOIN {Item._meta.db_table} it ON it.id = f.item_id '
+        f'GROUP BY 1, 2, 3',
+        list(params) + [Log.Events.SHOW]
+    )
+    inserted = 0
+    spend = {}
+    for item_id, day, max_rate, shows, count in cursor.fetchall():
+        inserted += count
+        if item_id is not None and shows:
+            spend[(item_id, day)] = spend.get((item_id, day), 0) + shows * max_rate
+    return inserted, spend
+
+
+def _log_point(log):
+    point = log.point
+    srid = Log._meta.get_field('point').srid
+    if point.srid is None:
+        point.srid = srid
+    elif point.srid != srid:
+        point.transform(srid)
+    return point
+
+
+def insert_logs(logs):
+    """
+    Write logs with multi-row inserts inside one transaction.
+    Events already stored are skipped (ON CONFLICT DO NOTHING), spend of the inserted shows is added to DailySpend
+    :return: number of logs received
+    """
+    log_table = Log._meta.db_table
+    spend = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(logs), INSERT_BATCH_SIZE):
+            batch = logs[start:start + INSERT_BATCH_SIZE]
+            params = []
+            for log in batch:
+                params += [log.module_id, log.timestamp, _log_point(log).hexewkb.decode(), log.event, log.item_file_id,
+                           json.dumps(log.data) if log.data is not None else None]
+            _, batch_spend = _inserted_spend(
+                cursor,
+                f'INSERT INTO {log_table} (module_id, "timestamp", point, event, item_file_id, data) VALUES '
+                + ', '.join(['(%s, %s, %s::geometry, %s, %s, %s::jsonb)'] * len(batch))
+                + ' ON CONFLICT (module_id, "timestamp", event) DO NOTHING RETURNING "timestamp", event, item_file_id',
+                params
+            )
+            for key, amount in batch_spend.items():
+                spend[key] = spend.get(key, 0) + amount
+        persist_spend(cursor, spend)
+    spend_tracker.add_spend(spend)
+    return len(logs)
+
+
+class _CopyStream:
+    """File-like object feeding COPY FROM STDIN with rows produced by a generator"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._rows).encode()
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+def _copy_value(value) -> str:
+    """Format a value for COPY text format"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+
+
+def _copy_row(line_no, log, item_file) -> str:
+    values = (
+        line_no,
+        log.timestamp.isoformat(),
+        _log_point(log).hexewkb.decode(),
+        log.event,
+        item_file if isinstance(item_file, str) else None,
+        item_file if isinstance(item_file, int) else None,
+        json.dumps(log.data) if log.data is not None else None,
+    )
+    return '\t'.join(_copy_value(value) for value in values) + '\n'
+
+
+def copy_features(lines, videomodule):
+    """
+    Stream newline-delimited GeoJSON features into the logs table with COPY FROM STDIN.
+    Features are validated with the same rules as parse_features, wrong lines are skipped.
+    Item file ids and paths are resolved by the database after the copy, events already stored are skipped
+    :param lines: iterable of lines, one GeoJSON feature per line
+    :param videomodule: VideoModule which sent the features
+    :return: numbers of accepted, duplicated and rejected lines and errors with line indexes
+    """
+    errors = []
+    rejected = 0
+    copied = 0
+
+    def reject(line_no, detail):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"index": line_no, "detail": detail})
+
+    def rows():
+        nonlocal copied
+        for line_no, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                log, item_file = _parse_feature(json.loads(line), videomodule)
+            except ValueError:
+                reject(line_no, 'Cannot parse JSON')
+                continue
+            except ParsingError as e:
+                reject(line_no, str(e))
+                continue
+            copied += 1
+            yield _copy_row(line_no, log, item_file)
+
+    log_table = Log._meta.db_table
+    item_file_table = ItemFile._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE logger_log_staging ('
+            ' line integer, "timestamp" timestamp with time zone, point geometry(Point, 4326),'
+            ' event varchar(2), item_file text, item_file_id bigint, data jsonb'
+            ') ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            'COPY logger_log_staging (line, "timestamp", point, event, item_file, item_file_id, data) FROM STDIN',
+            _CopyStream(rows()),
+        )
+        # paths are resolved as by resolve_item_files: a path shared by several item files
+        # is resolved to the only one of an active item
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE logger_log_paths ON COMMIT DROP AS '
+            f'SELECT f.image, CASE WHEN count(*) = 1 THEN min(f.id) ELSE min(f.id) FILTER (WHERE i.is_active) END AS id '
+            f'FROM {item_file_table} f JOIN {Item._meta.db_table} i ON i.id = f.item_id '
+            f'WHERE f.image IN (SELECT item_file FROM logger_log_staging) '
+            f'GROUP BY f.image HAVING count(*) = 1 OR count(*) FILTER (WHERE i.is_active) = 1'
+        )
+        cursor.execute(
+            f'SELECT s.line FROM logger_log_staging s '
+            f'WHERE s.item_file IS NOT NULL AND NOT EXISTS (SELECT 1 FROM logger_log_paths f WHERE f.image = s.item_file) '
+            f'OR s.item_file_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {item_file_table} f WHERE f.id = s.item_file_id) '
+            f'ORDER BY s.line'
+        )
+        for (line_no,) in cursor.fetchall():
+            copied -= 1
+            reject(line_no, f'Item file {ITEM_FILE_NOT_FOUND}')
+        accepted, spend = _inserted_spend(
+            cursor,
+            f'INSERT INTO {log_table} (module_id, "timestamp", point, event, item_file_id, data) '
+            f'SELECT %s, s."timestamp", s.point, s.event, coalesce(g.id, f.id), s.data FROM logger_log_staging s '
+            f'LEFT JOIN logger_log_paths f ON f.image = s.item_file '
+            f'LEFT JOIN {item_file_table} g ON g.id = s.item_file_id '
+            f'WHERE (s.item_file IS NULL OR f.id IS NOT NULL) AND (s.item_file_id IS NULL OR g.id IS NOT NULL) '
+            f'ON CONFLICT (module_id, "timestamp", event) DO NOTHING RETURNING "timestamp", event, item_file_id',
+            [videomodule.pk]
+        )
+        persist_spend(cursor, spend)
+        cursor.execute('DROP TABLE logger_log_staging, logger_log_paths')
+    spend_tracker.add_spend(spend)
+
+    errors.sort(key=lambda error: error["index"])
+    return accepted, copied - accepted, rejected, errors
@@ -0,0 +1,36 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncDate
+
+from logger import archive, partitions
+from logger.models import Log
+
+
+class Command(BaseCommand):
+    help = 'Move logs older than the retention horizon to the archive on the default storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention horizon in days, LOG_RETENTION_DAYS by default')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.LOG_RETENTION_DAYS
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        horizon = today - datetime.timedelta(days=days)
+        horizon_start = datetime.datetime(horizon.year, horizon.month, horizon.day, tzinfo=datetime.timezone.utc)
+
+        module_days = (Log.objects.filter(timestamp__lt=horizon_start)
+                       .annotate(day=TruncDate('timestamp', tzinfo=datetime.timezone.utc))
+                       .values_list('module_id', 'day')
+                       .distinct()
+                       .order_by('day', 'module_id'))
+        total = 0
+        for module_id, day in module_days:
+            total += archive.archive_day(module_id, day)
+        self.stdout.write(f'Archived {total} logs older than {horizon}')
+
+        # partitions before the horizon are empty now, partitions of logs uploaded meanwhile are archived by the next run
+        for name in partitions.detach_partitions(horizon, drop=True, only_empty=True):
+            self.stdout.write(f'Dropped {name}')
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from logger import spool
+from logger.ingestion import insert_logs
+
+
+class Command(BaseCommand):
+    help = 'Write logs spooled by the incoming view into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of logs written in one transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep draining the spool until interrupted')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the spool is empty')
+        parser.add_argument('--stale-after', type=float, default=600,
+                            help='Seconds after which files claimed by a dead worker are returned to the spool')
+
+    def handle(self, *args, **options):
+        spool.requeue_stale(options['stale_after'])
+        while True:
+            written = self.drain(options['batch_size'])
+            if written:
+                self.stdout.write(f'Written {written} logs')
+            if not options['loop']:
+                break
+            if not written:
+                time.sleep(options['interval'])
+
+    def drain(self, batch_size: int) -> int:
+        """Drain the spool until it is empty, return number of written logs"""
+        written = 0
+        while True:
+            claimed = spool.claim(batch_size)
+            if not claimed:
+                return written
+            try:
+                written += insert_logs([log for _, logs in claimed for log in logs])
+                for path, _ in claimed:
+                    spool.complete(path)
+            except DatabaseError:
+                # find the files which cannot be written
+                for path, logs in claimed:
+                    try:
+                        written += insert_logs(logs)
+                        spool.complete(path)
+                    except DatabaseError as e:
+                        self.stderr.write(f'Cannot write {path}: {e}')
+                        spool.fail(path)
@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from logger import partitions
+
+
+class Command(BaseCommand):
+    help = 'Create monthly partitions of the logs table in advance and detach the old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=2, help='Number of months to create partitions for')
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Detach partitions older than this number of months')
+        parser.add_argument('--drop', action='store_true', help='Drop the detached partitions')
+
+    def handle(self, *args, **options):
+        month = partitions.month_start(datetime.datetime.now(datetime.timezone.utc))
+        until = month
+        for _ in range(options['months_ahead']):
+            until = partitions.next_month(until)
+        for name in partitions.ensure_partitions(until):
+            self.stdout.write(f'Created {name}')
+
+        if options['retain_months'] is not None:
+            before = month
+            for _ in range(options['retain_months']):
+                before = partitions.month_start(before - datetime.timedelta(days=1))
+            for name in partitions.detach_partitions(before, drop=options['drop']):
+                self.stdout.write(f'{"Dropped" if options["drop"] else "Detached"} {name}')
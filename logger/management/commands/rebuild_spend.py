@@ -0,0 +1,21 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from logger.spend import rebuild_spend
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily spend of items from the stored SHOW logs at the current max_rate of the items. ' \
+           'Days already archived must not be rebuilt, their logs are not in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help='Number of UTC days to rebuild, the current one included')
+
+    def handle(self, *args, **options):
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        for offset in range(options['days']):
+            day = today - datetime.timedelta(days=offset)
+            items = rebuild_spend(day)
+            self.stdout.write(f'{day}: spend of {items} items')
+
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from logger.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Add SHOW logs written since the last run to the item and module show counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100_000, help='Range of log ids processed in one transaction')
+
+    def handle(self, *args, **options):
+        processed = update_rollups(options['batch_size'])
+        self.stdout.write(f'Processed {processed} log ids')
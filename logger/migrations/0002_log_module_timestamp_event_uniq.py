@@ -0,0 +1,23 @@
+# Generated by Django 4.0 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0001_initial'),
+    ]
+
+    operations = [
+        # remove events stored more than once by retried uploads
+        migrations.RunSQL(
+            sql='DELETE FROM logger_log a USING logger_log b '
+                'WHERE a.module_id = b.module_id AND a.timestamp = b.timestamp AND a.event = b.event AND a.id > b.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='log',
+            constraint=models.UniqueConstraint(fields=('module', 'timestamp', 'event'), name='module_timestamp_event_uniq'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.0 on 2026-10-17 11:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# Rebuild logger_log as a table partitioned by month of timestamp.
+# Indexes and constraints keep their names so that Django migrations still find them,
+# the primary key has to include the partition key.
+PARTITION_LOG_SQL = """
+DO $$
+DECLARE
+    r record;
+    month timestamp with time zone;
+    last_month timestamp with time zone;
+BEGIN
+    ALTER TABLE logger_log RENAME TO logger_log_unpartitioned;
+
+    CREATE TEMPORARY TABLE logger_log_definitions ON COMMIT DROP AS
+        SELECT 'constraint' AS kind, conname::text AS name, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = 'logger_log_unpartitioned'::regclass AND contype <> 'p'
+        UNION ALL
+        SELECT 'index', c.relname::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'logger_log_unpartitioned'::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid);
+
+    -- free the names for the partitioned table
+    FOR r IN SELECT conname FROM pg_constraint WHERE conrelid = 'logger_log_unpartitioned'::regclass LOOP
+        EXECUTE format('ALTER TABLE logger_log_unpartitioned RENAME CONSTRAINT %I TO %I', r.conname, left(r.conname, 55) || '_unpart');
+    END LOOP;
+    FOR r IN SELECT name FROM logger_log_definitions WHERE kind = 'index' LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', r.name, left(r.name, 55) || '_unpart');
+    END LOOP;
+
+    CREATE TABLE logger_log (LIKE logger_log_unpartitioned INCLUDING DEFAULTS INCLUDING STORAGE)
+        PARTITION BY RANGE ("timestamp");
+    ALTER TABLE logger_log ADD CONSTRAINT logger_log_pkey PRIMARY KEY (id, "timestamp");
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY logger_log.id', pg_get_serial_sequence('logger_log_unpartitioned', 'id'));
+
+    FOR r IN SELECT name, definition FROM logger_log_definitions WHERE kind = 'constraint' LOOP
+        EXECUTE format('ALTER TABLE logger_log ADD CONSTRAINT %I %s', r.name, r.definition);
+    END LOOP;
+    FOR r IN SELECT definition FROM logger_log_definitions WHERE kind = 'index' LOOP
+        EXECUTE regexp_replace(r.definition, ' ON \\S+ USING ', ' ON logger_log USING ');
+    END LOOP;
+
+    -- monthly partitions for the stored logs and the next months, rows out of them go to the default partition
+    SELECT date_trunc('month', coalesce(min("timestamp"), now()), 'UTC'),
+           date_trunc('month', greatest(max("timestamp"), now()), 'UTC') + interval '2 months'
+    INTO month, last_month
+    FROM logger_log_unpartitioned;
+    WHILE month <= last_month LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF logger_log FOR VALUES FROM (%L) TO (%L)',
+                       'logger_log_p' || to_char(month AT TIME ZONE 'UTC', 'YYYY_MM'),
+                       month, month + interval '1 month');
+        month := month + interval '1 month';
+    END LOOP;
+    CREATE TABLE logger_log_default PARTITION OF logger_log DEFAULT;
+
+    INSERT INTO logger_log SELECT * FROM logger_log_unpartitioned;
+    DROP TABLE logger_log_unpartitioned;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0002_log_module_timestamp_event_uniq'),
+    ]
+
+    operations = [
+        # the partitioned table has the same columns, it is kept when migrating backwards
+        migrations.RunSQL(sql=PARTITION_LOG_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='log',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='timestamp_brin_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.0 on 2026-10-17 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0006_alter_item_name'),
+        ('logger', '0003_partition_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('last_log_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ModuleDailyShows',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shows', models.PositiveIntegerField(default=0)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='logger.videomodule')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemHourlyShows',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('shows', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='client_space.item')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='moduledailyshows',
+            constraint=models.UniqueConstraint(fields=('module', 'day'), name='module_day_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemhourlyshows',
+            constraint=models.UniqueConstraint(fields=('item', 'hour'), name='item_hour_uniq'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0 on 2026-10-17 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_space', '0006_alter_item_name'),
+        ('logger', '0004_itemhourlyshows_moduledailyshows_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=11)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='client_space.item')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyspend',
+            constraint=models.UniqueConstraint(fields=('item', 'day'), name='item_day_uniq'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models as geomodels
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from client_space.models import ItemFile
+from client_space.models import Item, ItemFile
 
 
 class VideoModule(models.Model):
@@ -37,7 +38,69 @@ class Log(models.Model):
         indexes = [
             models.Index(fields=['module'], name='module_idx'),
             models.Index(fields=['item_file'], name='item_file_idx'),
+            # logs are appended in time order and stored in monthly partitions, see logger.partitions
+            BrinIndex(fields=['timestamp'], name='timestamp_brin_idx', autosummarize=True),
+        ]
+        constraints = [
+            # modules retry uploads, an event of a module is stored once
+            models.UniqueConstraint(fields=['module', 'timestamp', 'event'], name='module_timestamp_event_uniq'),
         ]
 
     def __str__(self):
         return f"{self.module.name} @ {self.timestamp}"
+
+
+class ItemHourlyShows(models.Model):
+    """Number of shows of an item per hour, maintained by `manage.py rollup_logs`"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    shows = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'hour'], name='item_hour_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.name} @ {self.hour}: {self.shows}"
+
+
+class ModuleDailyShows(models.Model):
+    """Number of shows of a module per day, maintained by `manage.py rollup_logs`"""
+    module = models.ForeignKey(VideoModule, on_delete=models.CASCADE)
+    day = models.DateField()
+    shows = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['module', 'day'], name='module_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.module.name} @ {self.day}: {self.shows}"
+
+
+class RollupWatermark(models.Model):
+    """Last log included in the rollups and the next bound of logs safe to include, see logger.rollups"""
+    name = models.CharField(max_length=64, unique=True)
+    last_log_id = models.BigIntegerField(default=0)
+    pending_log_id = models.BigIntegerField(default=0)
+    pending_xids = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_log_id}"
+
+
+class DailySpend(models.Model):
+    """Spend of an item for a UTC day, shows are added by the log ingestion, see logger.spend"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    day = models.DateField()
+    spend = models.DecimalField(max_digits=11, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'day'], name='item_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.name} @ {self.day}: {self.spend}"
@@ -0,0 +1,112 @@
+"""
+Monthly partitions of the logs table.
+logger_log is partitioned by range of timestamp (see migration 0003_partition_log),
+logs which do not fall into a monthly partition are stored in the default partition
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+
+from logger.models import Log
+
+DEFAULT_PARTITION = 'logger_log_default'
+PARTITION_NAME = re.compile(r'^logger_log_p(\d{4})_(\d{2})$')
+
+
+def month_start(day: datetime.date) -> datetime.datetime:
+    """Start of the UTC month of the day"""
+    return datetime.datetime(day.year, day.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def next_month(month: datetime.datetime) -> datetime.datetime:
+    return month_start(month + datetime.timedelta(days=32))
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f'logger_log_p{month:%Y_%m}'
+
+
+def list_partitions() -> dict:
+    """
+    Monthly partitions attached to the logs table
+    :return: dict partition name -> start of the month
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass',
+            [Log._meta.db_table]
+        )
+        names = [name for (name,) in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+    return partitions
+
+
+def create_partition(month: datetime.datetime) -> str:
+    """
+    Create the partition of a month.
+    Logs of the month already stored in the default partition are moved into the new partition
+    :return: name of the partition
+    """
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+                       [month, next_month(month)])
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE TABLE {name} PARTITION OF {Log._meta.db_table} FOR VALUES {bounds}')
+        else:
+            cursor.execute(f'CREATE TABLE {name} (LIKE {Log._meta.db_table} INCLUDING DEFAULTS INCLUDING STORAGE)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO {name} SELECT * FROM moved',
+                [month, next_month(month)]
+            )
+            cursor.execute(f'ALTER TABLE {Log._meta.db_table} ATTACH PARTITION {name} FOR VALUES {bounds}')
+    return name
+
+
+def ensure_partitions(until: datetime.date) -> list:
+    """
+    Create monthly partitions from the current month to the month of until
+    :return: names of the created partitions
+    """
+    existing = set(list_partitions())
+    created = []
+    month = month_start(datetime.datetime.now(datetime.timezone.utc))
+    while month <= month_start(until):
+        if partition_name(month) not in existing:
+            created.append(create_partition(month))
+        month = next_month(month)
+    return created
+
+
+def detach_partitions(before: datetime.date, drop: bool = False, only_empty: bool = False) -> list:
+    """
+    Detach partitions of the months which end before the date
+    :param drop: drop the detached partitions
+    :param only_empty: keep partitions still having logs
+    :return: names of the detached partitions
+    """
+    detached = []
+    for name, month in sorted(list_partitions().items(), key=lambda p: p[1]):
+        if next_month(month) > month_start(before):
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            if only_empty:
+                # logs uploaded late wait for the partition to be detached and go to the default partition
+                cursor.execute(f'LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE')
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {name})')
+                if cursor.fetchone()[0]:
+                    continue
+            cursor.execute(f'ALTER TABLE {Log._meta.db_table} DETACH PARTITION {name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {name}')
+        detached.append(name)
+    return detached
@@ -0,0 +1,88 @@
+"""
+Incrementally maintained show counts.
+Every run adds the SHOW logs written since the previous run (tracked by the last log id)
+to the hourly item counts and the daily module counts.
+Logs are inserted in long transactions, so a log with a lower id may commit after a log with a higher one.
+Each run takes a bound: the highest log id visible and the transactions in progress at that moment.
+The next run includes logs up to the bound only when all of those transactions are finished,
+so that every log with an id up to the bound is either committed and visible or rolled back
+"""
+from django.db import connection, transaction
+from django.db.models import Max
+
+from client_space.models import ItemFile
+from logger.models import ItemHourlyShows, Log, ModuleDailyShows, RollupWatermark
+
+WATERMARK_NAME = 'shows'
+
+
+def _take_bound() -> tuple:
+    """
+    Highest visible log id and transactions in progress.
+    The transactions are read after the log id, so that a transaction which allocated a lower id
+    and is not committed yet is among them
+    :return: log id, list of transaction ids
+    """
+    last_log_id = Log.objects.aggregate(last=Max('pk'))['last'] or 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xip(txid_current_snapshot())')
+        xids = [xid for (xid,) in cursor.fetchall()]
+    return last_log_id, xids
+
+
+def _in_progress(xids) -> bool:
+    """Check any of the transactions is still in progress"""
+    if not xids:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM unnest(%s::bigint[]) x WHERE txid_status(x) = \'in progress\'', [list(xids)])
+        return cursor.fetchone()[0] > 0
+
+
+def update_rollups(batch_size: int = 100_000) -> int:
+    """
+    Add SHOW logs written since the last run and safe to read to the rollups
+    :param batch_size: maximum range of log ids processed in one transaction
+    :return: number of processed log ids
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        if _in_progress(watermark.pending_xids):
+            return 0
+        safe_log_id = watermark.pending_log_id
+        watermark.pending_log_id, watermark.pending_xids = _take_bound()
+        watermark.save()
+
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            if watermark.last_log_id >= safe_log_id:
+                return processed
+            last_log_id = min(safe_log_id, watermark.last_log_id + batch_size)
+            _add_shows(watermark.last_log_id, last_log_id)
+            processed += last_log_id - watermark.last_log_id
+            watermark.last_log_id = last_log_id
+            watermark.save()
+
+
+def _add_shows(after_id: int, last_id: int):
+    log_table = Log._meta.db_table
+    params = [after_id, last_id, Log.Events.SHOW]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ItemHourlyShows._meta.db_table} AS r (item_id, hour, shows) '
+            f'SELECT f.item_id, date_trunc(\'hour\', l."timestamp" AT TIME ZONE \'UTC\') AT TIME ZONE \'UTC\', count(*) '
+            f'FROM {log_table} l JOIN {ItemFile._meta.db_table} f ON f.id = l.item_file_id '
+            f'WHERE l.id > %s AND l.id <= %s AND l.event = %s GROUP BY 1, 2 '
+            f'ON CONFLICT (item_id, hour) DO UPDATE SET shows = r.shows + EXCLUDED.shows',
+            params
+        )
+        cursor.execute(
+            f'INSERT INTO {ModuleDailyShows._meta.db_table} AS r (module_id, day, shows) '
+            f'SELECT l.module_id, (l."timestamp" AT TIME ZONE \'UTC\')::date, count(*) '
+            f'FROM {log_table} l '
+            f'WHERE l.id > %s AND l.id <= %s AND l.event = %s GROUP BY 1, 2 '
+            f'ON CONFLICT (module_id, day) DO UPDATE SET shows = r.shows + EXCLUDED.shows',
+            params
+        )
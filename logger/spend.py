@@ -0,0 +1,160 @@
+"""
+Spend of items for the current UTC day.
+One show of an item costs its max_rate, an item is within budget while one more show
+does not exceed its max_daily_spend.
+DailySpend holds the totals: the ingestion adds the shows it inserts to them in the same transaction,
+so the totals count every stored show once, and the in-process tracker is loaded from them.
+`manage.py rebuild_spend` recomputes the totals from the stored logs
+"""
+import datetime
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.dispatch import receiver
+
+from client_space.models import Item, ItemFile
+from logger.models import DailySpend, Log
+
+
+def persist_spend(cursor, spend: dict):
+    """
+    Add spend of inserted shows to DailySpend, must run in the transaction inserting the shows
+    :param cursor: database cursor
+    :param spend: dict (item_id, day) -> spend
+    """
+    if not spend:
+        return
+    cursor.executemany(
+        f'INSERT INTO {DailySpend._meta.db_table} AS s (item_id, day, spend) VALUES (%s, %s, %s) '
+        f'ON CONFLICT (item_id, day) DO UPDATE SET spend = s.spend + EXCLUDED.spend',
+        [(item_id, day, amount) for (item_id, day), amount in spend.items()]
+    )
+
+
+def rebuild_spend(day: datetime.date) -> int:
+    """
+    Replace the daily spend of items for the day with the spend of the stored shows
+    :return: number of items with spend
+    """
+    start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+    spend_table = DailySpend._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # the ingestion inserts shows and adds their spend in one transaction: transactions which added spend
+        # are waited for and their shows are counted, the others add their spend after the rebuild
+        cursor.execute(f'LOCK TABLE {spend_table} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'DELETE FROM {spend_table} WHERE day = %s', [day])
+        cursor.execute(
+            f'INSERT INTO {spend_table} (item_id, day, spend) '
+            f'SELECT f.item_id, %s, count(*) * it.max_rate FROM {Log._meta.db_table} l '
+            f'JOIN {ItemFile._meta.db_table} f ON f.id = l.item_file_id '
+            f'JOIN {Item._meta.db_table} it ON it.id = f.item_id '
+            f'WHERE l.event = %s AND l."timestamp" >= %s AND l."timestamp" < %s '
+            f'GROUP BY f.item_id, it.max_rate',
+            [day, Log.Events.SHOW, start, start + datetime.timedelta(days=1)]
+        )
+        return cursor.rowcount
+
+
+class SpendTracker:
+    """
+    In-process spend accumulator.
+    Totals of the current day are loaded from DailySpend, shows inserted by this process are added as they come,
+    and every SPEND_TRACKER_REFRESH seconds the totals are reloaded to pick up shows inserted by other processes.
+    Items created or changed after the last reload are loaded when they are asked for
+    """
+
+    def __init__(self, refresh: float = None):
+        self.refresh = refresh or getattr(settings, 'SPEND_TRACKER_REFRESH', 60)
+        self._lock = threading.Lock()
+        self._day = None
+        self._loaded_at = 0
+        self._spend = {}
+        self._budgets = {}
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def _is_stale(self) -> bool:
+        return self._day != self._today() or time.monotonic() - self._loaded_at > self.refresh
+
+    def _ensure_loaded(self):
+        if self._is_stale():
+            self.reload()
+
+    def reload(self):
+        """Load spend of the current day from DailySpend"""
+        day = self._today()
+        budgets = {item_id: (max_rate, max_daily_spend)
+                   for item_id, max_rate, max_daily_spend in Item.objects.values_list('id', 'max_rate', 'max_daily_spend')}
+        spend = dict(DailySpend.objects.filter(day=day).values_list('item_id', 'spend'))
+
+        with self._lock:
+            self._day = day
+            self._loaded_at = time.monotonic()
+            self._spend = spend
+            self._budgets = budgets
+
+    def _load_item(self, item_id: int):
+        """Load budget and spend of an item created after the last reload, None if there is no such item"""
+        budget = Item.objects.filter(pk=item_id).values_list('max_rate', 'max_daily_spend').first()
+        spend = DailySpend.objects.filter(item_id=item_id, day=self._day).values_list('spend', flat=True).first()
+        with self._lock:
+            # unknown items are not looked up again until the next reload
+            self._budgets[item_id] = budget
+            if spend is not None:
+                self._spend[item_id] = spend
+        return budget
+
+    def forget(self, item_id: int):
+        """Drop the budget of a changed item, it is loaded again when asked for"""
+        with self._lock:
+            self._budgets.pop(item_id, None)
+
+    def invalidate(self):
+        """Reload spend on the next request"""
+        with self._lock:
+            self._loaded_at = 0
+
+    def add_spend(self, spend: dict):
+        """
+        Add spend of shows inserted by this process
+        :param spend: dict (item_id, day) -> spend, as passed to persist_spend
+        """
+        if self._is_stale():
+            # the reload reads the persisted spend
+            return
+        with self._lock:
+            for (item_id, day), amount in spend.items():
+                if day == self._day:
+                    self._spend[item_id] = self._spend.get(item_id, Decimal(0)) + amount
+
+    def spend(self, item_id: int) -> Decimal:
+        """Spend of the item for the current day"""
+        self._ensure_loaded()
+        return self._spend.get(item_id, Decimal(0))
+
+    def within_budget(self, item_id: int) -> bool:
+        """Check one more show of the item fits its max_daily_spend, unknown items are not allowed"""
+        self._ensure_loaded()
+        if item_id in self._budgets:
+            budget = self._budgets[item_id]
+        else:
+            budget = self._load_item(item_id)
+        if budget is None:
+            return False
+        max_rate, max_daily_spend = budget
+        return self._spend.get(item_id, Decimal(0)) + max_rate <= max_daily_spend
+
+
+spend_tracker = SpendTracker()
+
+
+@receiver(models.signals.post_save, sender=Item)
+@receiver(models.signals.post_delete, sender=Item)
+def item_budget_changed(sender, instance, *args, **kwargs):
+    """ Load max_rate and max_daily_spend of the changed item again """
+    spend_tracker.forget(instance.pk)
@@ -0,0 +1,137 @@
+"""
+Durable local spool of validated logs.
+The incoming view writes every accepted batch into its own file and `manage.py drain_log_spool`
+writes the spooled logs into the database in large batches
+"""
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils.dateparse import parse_datetime
+
+from logger.models import Log
+
+READY_SUFFIX = '.jsonl'
+CLAIMED_SUFFIX = '.work'
+FAILED_SUFFIX = '.failed'
+TEMP_SUFFIX = '.tmp'
+
+
+def _spool_dir() -> str:
+    os.makedirs(settings.LOG_SPOOL_DIR, exist_ok=True)
+    return settings.LOG_SPOOL_DIR
+
+
+def _serialize(log) -> dict:
+    return {
+        "module": log.module_id,
+        "timestamp": log.timestamp.isoformat(),
+        "point": log.point.ewkt,
+        "event": log.event,
+        "item_file": log.item_file_id,
+        "data": log.data,
+    }
+
+
+def _deserialize(row) -> Log:
+    return Log(
+        module_id=row['module'],
+        timestamp=parse_datetime(row['timestamp']),
+        point=GEOSGeometry(row['point']),
+        event=row['event'],
+        item_file_id=row['item_file'],
+        data=row['data'],
+    )
+
+
+def enqueue(logs) -> int:
+    """
+    Durably write validated logs into a new spool file.
+    The file is written under a temporary name, synced and renamed
+    so that workers see only complete files
+    :param logs: list of unsaved Log objects
+    :return: number of spooled logs
+    """
+    directory = _spool_dir()
+    name = f'{time.time_ns():020d}-{uuid.uuid4().hex}'
+    temp_path = os.path.join(directory, name + TEMP_SUFFIX)
+    with open(temp_path, 'w') as f:
+        for log in logs:
+            f.write(json.dumps(_serialize(log)) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temp_path, os.path.join(directory, name + READY_SUFFIX))
+
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return len(logs)
+
+
+def claim(max_logs: int) -> list:
+    """
+    Claim the oldest spool files by renaming them until they hold at least max_logs logs
+    :return: list of (path of the claimed file, list of Log objects)
+    """
+    directory = _spool_dir()
+    claimed = []
+    total = 0
+    for name in sorted(os.listdir(directory)):
+        if total >= max_logs:
+            break
+        if not name.endswith(READY_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        claimed_path = path[:-len(READY_SUFFIX)] + CLAIMED_SUFFIX
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            # claimed by another worker
+            continue
+        os.utime(claimed_path)
+        try:
+            with open(claimed_path) as f:
+                logs = [_deserialize(json.loads(line)) for line in f if line.strip()]
+        except (KeyError, TypeError, ValueError):
+            fail(claimed_path)
+            continue
+        claimed.append((claimed_path, logs))
+        total += len(logs)
+    return claimed
+
+
+def complete(path):
+    """Remove a claimed spool file once its logs are written"""
+    os.remove(path)
+
+
+def fail(path):
+    """Put aside a claimed spool file whose logs cannot be written"""
+    os.rename(path, path[:-len(CLAIMED_SUFFIX)] + FAILED_SUFFIX)
+
+
+def requeue_stale(stale_after: float) -> int:
+    """
+    Return files claimed by workers that died before writing them back to the spool
+    :param stale_after: age of a claimed file in seconds
+    :return: number of returned files
+    """
+    directory = _spool_dir()
+    now = time.time()
+    count = 0
+    for name in os.listdir(directory):
+        if not name.endswith(CLAIMED_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > stale_after:
+                os.rename(path, path[:-len(CLAIMED_SUFFIX)] + READY_SUFFIX)
+                count += 1
+        except FileNotFoundError:
+            continue
+    return count
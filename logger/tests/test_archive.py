@@ -0,0 +1,55 @@
+import datetime
+import tempfile
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from logger import archive
+from logger.models import Log, VideoModule
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        user = User.objects.create(username="svcModule1", email="module1@example.com")
+        self.module = VideoModule.objects.create(user=user, name="Module1")
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.old = now - datetime.timedelta(days=40)
+        for minutes in range(3):
+            Log.objects.create(module=self.module, timestamp=self.old + datetime.timedelta(minutes=minutes),
+                               point=Point(37.53892600536346, 55.7412453008087), event=Log.Events.SHOW)
+        Log.objects.create(module=self.module, timestamp=now, point=Point(37.53892600536346, 55.7412453008087),
+                           event=Log.Events.START)
+
+    def test_archive_logs(self):
+        """Old logs are moved to the archive and can be read from it"""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            call_command('archive_logs', days=30)
+
+            self.assertEquals(Log.objects.count(), 1)
+            day = self.old.date()
+            archived = list(archive.archived_logs(day - datetime.timedelta(days=1), day + datetime.timedelta(days=2),
+                                                  event=Log.Events.SHOW))
+            self.assertEquals(len(archived), 3)
+            self.assertEquals(archived[0]['module'], self.module.pk)
+            self.assertEquals(archived[0]['point'], Point(37.53892600536346, 55.7412453008087, srid=4326))
+
+    def test_archive_late_logs(self):
+        """Logs uploaded after the day is archived are saved to another part, archived files are not rewritten"""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            call_command('archive_logs', days=30)
+            day = self.old.date()
+            first = archive.archive_parts(self.module.pk, day)
+            self.assertEquals(len(first), 1)
+
+            Log.objects.create(module=self.module, timestamp=self.old + datetime.timedelta(minutes=10),
+                               point=Point(37.53892600536346, 55.7412453008087), event=Log.Events.SHOW)
+            call_command('archive_logs', days=30)
+
+            self.assertEquals(Log.objects.count(), 1)
+            parts = archive.archive_parts(self.module.pk, day)
+            self.assertEquals(len(parts), 2)
+            self.assertIn(first[0], parts)
+            self.assertEquals(len(archive.read_archive(self.module.pk, day)['id']), 4)
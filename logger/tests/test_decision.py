@@ -0,0 +1,123 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.urls import reverse
+
+from client_space.item_index import ActiveItemIndex, active_item_index
+from client_space.models import Client, Item, ItemFile
+from logger.models import VideoModule
+
+test_user = {"username": "svcModule1", "email": "module1@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60, 55.74], [37.62, 55.74], [37.62, 55.76], [37.60, 55.76], [37.60, 55.74]]]]}
+other_areas = {"type": "MultiPolygon", "coordinates": [[[[37.50, 55.74], [37.52, 55.74], [37.52, 55.76], [37.50, 55.76], [37.50, 55.74]]]]}
+test_point = {"type": "Point", "coordinates": [37.61, 55.75]}
+
+
+class DecisionTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+        VideoModule.objects.create(user=new_user, name="Module1")
+
+        client = Client.objects.create(name="Client1")
+        for name, areas, is_active in (("Item1", test_areas, True), ("Item2", test_areas, False), ("Item3", other_areas, True)):
+            item = Item.objects.create(client=client, name=name, areas=GEOSGeometry(json.dumps(areas)), is_active=is_active)
+            ItemFile.objects.create(item=item, image=f'img/{name}.png')
+        active_item_index.invalidate()
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def decide(self, token, point):
+        res = self.client.post(reverse('logger:decision'),
+                               data={"point": point},
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 200)
+        return res.json()['data']
+
+    def test_decision_ok(self):
+        """Only active items containing the point are returned"""
+        token = self.get_token()
+
+        data = self.decide(token, test_point)
+        self.assertEquals([item['name'] for item in data], ['Item1'])
+        self.assertEquals(data[0]['item_files'][0]['image'], 'img/Item1.png')
+
+        item2 = Item.objects.get(name='Item2')
+        item2.is_active = True
+        item2.save()
+        self.assertEquals(sorted(item['name'] for item in self.decide(token, test_point)), ['Item1', 'Item2'])
+
+    def test_decision_wrong_point(self):
+        """Wrong point is rejected"""
+        token = self.get_token()
+        res = self.client.post(reverse('logger:decision'),
+                               data={"point": {"type": "Point"}},
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 400)
+
+    def test_decision_areas_changed(self):
+        """Index is refreshed when areas of an item change"""
+        token = self.get_token()
+        self.assertEquals([item['name'] for item in self.decide(token, test_point)], ['Item1'])
+
+        item3 = Item.objects.get(name='Item3')
+        item3.areas = GEOSGeometry(json.dumps(test_areas))
+        item3.save()
+        self.assertEquals(sorted(item['name'] for item in self.decide(token, test_point)), ['Item1', 'Item3'])
+
+        item3.delete()
+        self.assertEquals([item['name'] for item in self.decide(token, test_point)], ['Item1'])
+
+    def test_grid(self):
+        """Cells inside the areas need no exact test, boundary cells are tested, large areas use bounding boxes"""
+        index = ActiveItemIndex(cell_size=0.005, max_cells=100)
+        inside = GEOSGeometry('POINT (37.61 55.75)')
+        outside = GEOSGeometry('POINT (37.63 55.75)')
+        self.assertEquals(sorted(item['name'] for item in index.lookup(inside)), ['Item1'])
+        self.assertEquals(index.lookup(outside), [])
+        flags = [flag for items in index._cells.values() for flag in items.values()]
+        self.assertIn(True, flags)
+        self.assertIn(False, flags)
+
+        index = ActiveItemIndex(cell_size=0.001, max_cells=100)
+        self.assertEquals([item['name'] for item in index.lookup(inside)], ['Item1'])
+        self.assertEquals(len(index._large), 2)
+
+    def test_cells_kept(self):
+        """Items with unchanged areas are not rasterized again on refresh or rebuild"""
+        index = ActiveItemIndex(cell_size=0.005, max_cells=100)
+        inside = GEOSGeometry('POINT (37.61 55.75)')
+        index.lookup(inside)
+        item1 = Item.objects.get(name='Item1')
+        with mock.patch.object(index, '_rasterize', wraps=index._rasterize) as rasterize:
+            index.invalidate(item1.pk)
+            self.assertEquals([item['name'] for item in index.lookup(inside)], ['Item1'])
+            index.invalidate()
+            self.assertEquals([item['name'] for item in index.lookup(inside)], ['Item1'])
+            rasterize.assert_not_called()
+
+            item1.areas = GEOSGeometry(json.dumps(other_areas))
+            item1.save()
+            index.invalidate(item1.pk)
+            self.assertEquals(index.lookup(inside), [])
+            rasterize.assert_called_once()
@@ -1,9 +1,11 @@
 import json
+import tempfile
 
 from dateutil import parser as dateparser
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import GEOSGeometry
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from client_space.models import Client, ClientUser, Item, ItemFile
@@ -363,3 +365,145 @@ class ClientTests(TestCase):
             self.assertEquals(log.item_file, ItemFile.objects.get(image=props['item_file']) if props['item_file'] else None)
             self.assertEquals(log.timestamp, dateparser.parse(props['timestamp']))
             self.assertEquals(log.point, geom)
+
+    def test_insert_batch_ok(self):
+        """Test that the whole track can be inserted with one request"""
+        token = self.get_token()
+        batch = {"type": "FeatureCollection", "features": [f for test_log in test_track for f in test_log['features']]}
+
+        res = self.client.post(reverse('logger:incoming'),
+                               data=batch,
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+        self.assertEquals(res.status_code, 201)
+        self.assertEquals(res.json()['count'], len(batch['features']))
+        self.assertEquals(Log.objects.count(), len(batch['features']))
+        self.assertEquals(Log.objects.filter(event='SH', item_file__image='img/img1.png').count(), 3)
+
+    def test_insert_batch_item_file_id(self):
+        """Test that item files can be referred to by id"""
+        token = self.get_token()
+        item_file = ItemFile.objects.get(image='img/img1.png')
+        feature = json.loads(json.dumps(test_track[0]['features'][0]))
+        feature['properties']['item_file'] = item_file.pk
+        batch = {"type": "FeatureCollection", "features": [feature]}
+
+        res = self.client.post(reverse('logger:incoming'),
+                               data=batch,
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+        self.assertEquals(res.status_code, 201)
+        self.assertEquals(Log.objects.get().item_file, item_file)
+
+    def test_insert_batch_retry(self):
+        """Test that retried uploads and repeated events are stored once"""
+        token = self.get_token()
+        features = [f for test_log in test_track for f in test_log['features']]
+        batch = {"type": "FeatureCollection", "features": features + features[:2]}
+
+        for _ in range(2):
+            res = self.client.post(reverse('logger:incoming'),
+                                   data=batch,
+                                   content_type='application/json',
+                                   HTTP_AUTHORIZATION=f'Bearer {token}'
+                                   )
+            self.assertEquals(res.status_code, 201)
+
+        self.assertEquals(Log.objects.count(), len(features))
+
+    def test_insert_batch_with_errors(self):
+        """Test that a batch with wrong features is rejected with indexes of the wrong features"""
+        token = self.get_token()
+        features = [f for test_log in test_track for f in test_log['features']]
+        wrong_event = json.loads(json.dumps(features[1]))
+        wrong_event['properties']['event'] = 'XX'
+        wrong_file = json.loads(json.dumps(features[2]))
+        wrong_file['properties']['item_file'] = 'img/unknown.png'
+        batch = {"type": "FeatureCollection", "features": [features[0], wrong_event, wrong_file]}
+
+        res = self.client.post(reverse('logger:incoming'),
+                               data=batch,
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+        self.assertEquals(res.status_code, 400)
+        self.assertEquals([e['index'] for e in res.json()['errors']], [1, 2])
+        self.assertEquals(Log.objects.count(), 0)
+
+    def test_insert_stream_ok(self):
+        """Test that newline-delimited features are copied and wrong lines are rejected"""
+        token = self.get_token()
+        features = [f for test_log in test_track for f in test_log['features']]
+        wrong_file = json.loads(json.dumps(features[2]))
+        wrong_file['properties']['item_file'] = 'img/unknown.png'
+        lines = [json.dumps(f) for f in features] + ['not json', json.dumps(wrong_file)]
+
+        res = self.client.post(reverse('logger:incoming_stream'),
+                               data='\n'.join(lines),
+                               content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+
+        self.assertEquals(res.status_code, 201)
+        data = res.json()
+        self.assertEquals(data['accepted'], len(features))
+        self.assertEquals(data['rejected'], 2)
+        self.assertEquals([e['index'] for e in data['errors']], [len(features), len(features) + 1])
+        self.assertEquals(Log.objects.count(), len(features))
+        self.assertEquals(Log.objects.filter(event='SH', item_file__image='img/img3.png').count(), 2)
+
+        res = self.client.post(reverse('logger:incoming_stream'),
+                               data='\n'.join(lines),
+                               content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 201)
+        self.assertEquals(res.json()['accepted'], 0)
+        self.assertEquals(res.json()['duplicates'], len(features))
+        self.assertEquals(Log.objects.count(), len(features))
+
+    def test_insert_stream_shared_path(self):
+        """Test that a path shared by several items is resolved only to the one active item"""
+        token = self.get_token()
+        features = [f for test_log in test_track for f in test_log['features'] if f['properties']['item_file'] == 'img/img3.png']
+        item = Item.objects.create(client=Client.objects.get(name='Client2'), name='Shared', areas=GEOSGeometry(json.dumps(test_areas)))
+        shared = ItemFile.objects.create(item=item, image='img/img3.png')
+
+        res = self.client.post(reverse('logger:incoming_stream'),
+                               data='\n'.join(json.dumps(f) for f in features),
+                               content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.status_code, 201)
+        self.assertEquals(res.json()['rejected'], len(features))
+
+        Item.objects.filter(pk=item.pk).update(is_active=True)
+        res = self.client.post(reverse('logger:incoming_stream'),
+                               data='\n'.join(json.dumps(f) for f in features),
+                               content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION=f'Bearer {token}'
+                               )
+        self.assertEquals(res.json()['accepted'], len(features))
+        self.assertEquals(Log.objects.filter(item_file=shared).count(), len(features))
+
+    def test_insert_batch_async(self):
+        """Test that spooled logs are written by the spool worker"""
+        token = self.get_token()
+        batch = {"type": "FeatureCollection", "features": [f for test_log in test_track for f in test_log['features']]}
+
+        with tempfile.TemporaryDirectory() as spool_dir, override_settings(LOG_INGESTION_ASYNC=True, LOG_SPOOL_DIR=spool_dir):
+            res = self.client.post(reverse('logger:incoming'),
+                                   data=batch,
+                                   content_type='application/json',
+                                   HTTP_AUTHORIZATION=f'Bearer {token}'
+                                   )
+            self.assertEquals(res.status_code, 202)
+            self.assertEquals(Log.objects.count(), 0)
+
+            call_command('drain_log_spool')
+            self.assertEquals(Log.objects.count(), len(batch['features']))
@@ -0,0 +1,109 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.urls import reverse
+
+from client_space.models import Client, Item, ItemFile
+from logger.models import VideoModule
+
+test_user = {"username": "svcModule1", "email": "module1@example.com", "password": "testpassword"}
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60, 55.74], [37.62, 55.74], [37.62, 55.76], [37.60, 55.76], [37.60, 55.74]]]]}
+
+
+class ManifestTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        new_user = User.objects.create(username=test_user["username"], email=test_user["email"])
+        new_user.set_password(test_user["password"])
+        new_user.save()
+        VideoModule.objects.create(user=new_user, name="Module1")
+
+        client = Client.objects.create(name="Client1")
+        for name, is_active in (("Item1", True), ("Item2", False)):
+            item = Item.objects.create(client=client, name=name, areas=GEOSGeometry(json.dumps(test_areas)), is_active=is_active)
+            ItemFile.objects.create(item=item, image=f'img/{name}.png', md5=name.lower().ljust(32, '0'), size=10)
+
+    def get_token(self):
+        """Authorization request"""
+        res = self.client.post('/api/token/',
+                               data=json.dumps({
+                                   'email': test_user["email"],
+                                   'password': test_user["password"],
+                               }),
+                               content_type='application/json',
+                               )
+        result = json.loads(res.content)
+        self.assertTrue("access" in result)
+        return result["access"]
+
+    def get_manifest(self, token, since=None):
+        url = reverse('logger:manifest') if since is None else f"{reverse('logger:manifest')}?since={since}"
+        res = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 200)
+        return res.json()
+
+    def test_manifest_ok(self):
+        """Files of active items are listed, later syncs get only the changes"""
+        token = self.get_token()
+        data = self.get_manifest(token)
+        self.assertTrue(data['full'])
+        self.assertEquals([f['url'] for f in data['data']], ['/media/img/Item1.png'])
+        self.assertEquals(data['data'][0]['size'], 10)
+        version = data['version']
+
+        data = self.get_manifest(token, version)
+        self.assertFalse(data['full'])
+        self.assertEquals((data['version'], data['data'], data['removed']), (version, [], []))
+
+        item1, item2 = Item.objects.get(name='Item1'), Item.objects.get(name='Item2')
+        item1.is_active = False
+        item1.save()
+        item2.is_active = True
+        item2.save()
+        data = self.get_manifest(token, version)
+        self.assertEquals([f['id'] for f in data['data']], [ItemFile.objects.get(item=item2).pk])
+        self.assertEquals(data['removed'], [ItemFile.objects.get(item=item1).pk])
+
+        version = data['version']
+        ItemFile.objects.get(item=item2).delete()
+        data = self.get_manifest(token, version)
+        self.assertEquals((data['data'], len(data['removed'])), ([], 1))
+
+    def test_manifest_wrong_version(self):
+        """Wrong versions are rejected, unknown versions get the whole manifest"""
+        token = self.get_token()
+        res = self.client.get(f"{reverse('logger:manifest')}?since=x", HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 400)
+        data = self.get_manifest(token, 10 ** 9)
+        self.assertTrue(data['full'])
+        self.assertEquals(len(data['data']), 1)
+
+    def test_manifest_ids(self):
+        """Listed files are returned by ids with new URLs"""
+        token = self.get_token()
+        item_files = {f.item.name: f.pk for f in ItemFile.objects.select_related('item')}
+        ids = f"{item_files['Item1']},{item_files['Item2']}"
+        res = self.client.get(f"{reverse('logger:manifest')}?ids={ids}", HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals([(f['id'], f['url']) for f in res.json()['data']], [(item_files['Item1'], '/media/img/Item1.png')])
+
+        res = self.client.get(f"{reverse('logger:manifest')}?ids=1,x", HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEquals(res.status_code, 400)
+
+    def test_manifest_not_changed(self):
+        """Saving items and item files without changes of listed fields does not update the manifest"""
+        item = Item.objects.get(name='Item1')
+        item_file = ItemFile.objects.get(item=item)
+        with mock.patch('client_space.models.update_manifest') as update_manifest:
+            item.max_rate = 20
+            item.save()
+            item_file.status = ItemFile.Statuses.READY
+            item_file.save()
+            update_manifest.assert_not_called()
+
+            item.is_active = False
+            item.save()
+            update_manifest.assert_called_once_with([item.pk])
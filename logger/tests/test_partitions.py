@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from logger import partitions
+
+
+class PartitionTests(TestCase):
+    def test_create_partitions(self):
+        """Partitions are created for the current month and the months ahead"""
+        month = partitions.month_start(datetime.datetime.now(datetime.timezone.utc))
+        for _ in range(4):
+            month = partitions.next_month(month)
+
+        call_command('log_partitions', months_ahead=4)
+
+        self.assertIn(partitions.partition_name(month), partitions.list_partitions())
+
+    def test_detach_partitions(self):
+        """Partitions older than the retention are detached"""
+        month = partitions.month_start(datetime.datetime.now(datetime.timezone.utc))
+        old_month = partitions.month_start(month - datetime.timedelta(days=100))
+        partitions.create_partition(old_month)
+
+        call_command('log_partitions', retain_months=2, drop=True)
+
+        self.assertNotIn(partitions.partition_name(old_month), partitions.list_partitions())
+        self.assertIn(partitions.partition_name(month), partitions.list_partitions())
@@ -0,0 +1,52 @@
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.test import TestCase
+
+from client_space.models import Client, Item, ItemFile
+from logger.models import ItemHourlyShows, Log, VideoModule
+from logger.rollups import update_rollups
+
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        client = Client.objects.create(name="Client1")
+        self.item = Item.objects.create(client=client, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)))
+        self.item_file = ItemFile.objects.create(item=self.item, image='img/img1.png')
+        user = User.objects.create(username="svcModule1", email="module1@example.com")
+        self.module = VideoModule.objects.create(user=user, name="Module1")
+        self.hour = datetime.datetime(2022, 1, 8, 18, tzinfo=datetime.timezone.utc)
+
+    def show(self, pk, minutes):
+        Log.objects.create(pk=pk, module=self.module, timestamp=self.hour + datetime.timedelta(minutes=minutes),
+                           point=Point(37.60200012009591, 55.753318768941305), event=Log.Events.SHOW, item_file=self.item_file)
+
+    def shows(self):
+        return sum(ItemHourlyShows.objects.filter(item=self.item).values_list('shows', flat=True))
+
+    def test_logs_committed_out_of_order(self):
+        """A log with a lower id committed after a log with a higher one is counted"""
+        self.show(100, 0)
+        # another transaction allocated a lower id and is still in progress
+        with mock.patch('logger.rollups._take_bound', return_value=(100, [12345])):
+            update_rollups()
+        with mock.patch('logger.rollups._in_progress', return_value=True):
+            self.assertEquals(update_rollups(), 0)
+        self.assertEquals(self.shows(), 0)
+
+        # the transaction commits its log
+        self.show(50, 1)
+        with mock.patch('logger.rollups._in_progress', return_value=False):
+            self.assertEquals(update_rollups(), 100)
+        self.assertEquals(self.shows(), 2)
+
+        update_rollups()
+        update_rollups()
+        self.assertEquals(self.shows(), 2)
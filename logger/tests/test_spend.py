@@ -0,0 +1,83 @@
+import datetime
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.core.management import call_command
+from django.test import TestCase
+
+from client_space.models import Client, Item, ItemFile
+from logger.ingestion import insert_logs
+from logger.models import DailySpend, Log, VideoModule
+from logger.spend import SpendTracker, spend_tracker
+
+test_areas = {"type": "MultiPolygon", "coordinates": [[[[37.60200012009591, 55.753318768941305], [37.60157692828216, 55.750842010116045],
+                                                        [37.60936881881207, 55.74906941558997], [37.60200012009591, 55.753318768941305]]]]}
+
+
+class SpendTests(TestCase):
+    def setUp(self):
+        """Set up databse"""
+        client = Client.objects.create(name="Client1")
+        self.item = Item.objects.create(client=client, name="Item1", areas=GEOSGeometry(json.dumps(test_areas)),
+                                        is_active=True, max_rate=10, max_daily_spend=25)
+        self.item_file = ItemFile.objects.create(item=self.item, image='img/img1.png')
+        user = User.objects.create(username="svcModule1", email="module1@example.com")
+        self.module = VideoModule.objects.create(user=user, name="Module1")
+        self.now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+    def show(self, seconds):
+        return Log(module=self.module, timestamp=self.now - datetime.timedelta(seconds=seconds),
+                   point=Point(37.60200012009591, 55.753318768941305), event=Log.Events.SHOW, item_file=self.item_file)
+
+    def test_spend_loaded(self):
+        """Spend is loaded from the persisted totals"""
+        DailySpend.objects.create(item=self.item, day=self.now.date(), spend=20)
+        tracker = SpendTracker()
+
+        self.assertEquals(tracker.spend(self.item.pk), Decimal(20))
+        self.assertFalse(tracker.within_budget(self.item.pk))
+
+    def test_spend_recorded(self):
+        """Inserted shows are added to the spend once, retried shows are not charged again"""
+        tracker = SpendTracker()
+        self.assertTrue(tracker.within_budget(self.item.pk))
+
+        with mock.patch('logger.ingestion.spend_tracker', tracker):
+            insert_logs([self.show(1), self.show(2)])
+            insert_logs([self.show(1)])
+
+        self.assertEquals(Log.objects.count(), 2)
+        self.assertEquals(tracker.spend(self.item.pk), Decimal(20))
+        self.assertEquals(DailySpend.objects.get(item=self.item, day=self.now.date()).spend, Decimal(20))
+        self.assertEquals(SpendTracker().spend(self.item.pk), Decimal(20))
+
+    def test_new_item_budget(self):
+        """Items created after the load are checked against their budget, unknown items are not allowed"""
+        tracker = SpendTracker()
+        self.assertTrue(tracker.within_budget(self.item.pk))
+
+        item = Item.objects.create(client=self.item.client, name="Item2", areas=self.item.areas, max_rate=10, max_daily_spend=15)
+        DailySpend.objects.create(item=item, day=self.now.date(), spend=10)
+        self.assertFalse(tracker.within_budget(item.pk))
+        self.assertFalse(tracker.within_budget(item.pk + 1000))
+
+    def test_changed_item_budget(self):
+        """Changed budgets are applied without waiting for the reload"""
+        spend_tracker.reload()
+        self.assertTrue(spend_tracker.within_budget(self.item.pk))
+
+        self.item.max_daily_spend = 5
+        self.item.save()
+        self.assertFalse(spend_tracker.within_budget(self.item.pk))
+
+    def test_rebuild_spend(self):
+        """Daily spend is recomputed from the stored shows"""
+        Log.objects.bulk_create([self.show(1), self.show(2)])
+        DailySpend.objects.create(item=self.item, day=self.now.date(), spend=5)
+
+        call_command('rebuild_spend')
+
+        self.assertEquals(DailySpend.objects.get(item=self.item, day=self.now.date()).spend, Decimal(20))
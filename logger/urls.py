@@ -16,7 +16,7 @@ Including another URLconf
 from django.urls import path
 
 from . import views
-from .api_views import incoming
+from .api_views import decision, incoming, manifest
 
 
 app_name = 'logger'
@@ -26,4 +26,11 @@ urlpatterns = [
 
     # incoming
     path('incoming', incoming.logs, name='incoming'),
+    path('incoming/stream', incoming.logs_stream, name='incoming_stream'),
+
+    # decision
+    path('decision', decision.decision, name='decision'),
+
+    # manifest
+    path('manifest', manifest.manifest, name='manifest'),
 ]
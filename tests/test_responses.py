@@ -0,0 +1,33 @@
+import datetime
+import decimal
+import json
+
+from django.test import SimpleTestCase
+
+from xside_server.responses import JsonResponse, RawJSON, dumps
+
+
+class ResponsesTest(SimpleTestCase):
+    def test_dumps(self):
+        """Values are rendered like Django's JsonResponse, raw fragments are spliced as is"""
+        data = {
+            "areas": [RawJSON('{"type": "Point", "coordinates": [37.6, 55.7]}') for _ in range(11)],
+            "decimal": decimal.Decimal('1.50'),
+            "time": datetime.datetime(2022, 1, 8, 18, tzinfo=datetime.timezone.utc),
+            "text": "__raw_json_0",
+        }
+        result = json.loads(dumps(data))
+        self.assertEquals(result["areas"], [{"type": "Point", "coordinates": [37.6, 55.7]}] * 11)
+        self.assertEquals(result["decimal"], "1.50")
+        self.assertEquals(result["time"], "2022-01-08T18:00:00Z")
+        self.assertEquals(result["text"], "__raw_json_0")
+
+    def test_json_response(self):
+        """Only dicts are accepted unless safe is False"""
+        response = JsonResponse({"data": "OK"}, status=201)
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(response['Content-Type'], 'application/json')
+        self.assertEquals(json.loads(response.content), {"data": "OK"})
+        with self.assertRaises(TypeError):
+            JsonResponse([1, 2])
+        self.assertEquals(json.loads(JsonResponse([1, 2], safe=False).content), [1, 2])
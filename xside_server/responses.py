@@ -0,0 +1,60 @@
+import re
+import secrets
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class RawJSON:
+    """
+    Already serialized JSON value, e.g. GeoJSON from PostGIS,
+    spliced into the output of dumps without parsing
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value.encode() if isinstance(value, str) else bytes(value)
+
+    def __repr__(self):
+        return f'RawJSON({self.value[:50]!r})'
+
+
+def dumps(data) -> bytes:
+    """
+    Serialize data with orjson.
+    Values orjson doesn't support are converted like Django's JsonResponse does
+    """
+    fragments = []
+    # random marker, so that string values of the data cannot be taken for a fragment
+    marker = f'__raw_json_{secrets.token_hex(8)}_'
+    encoder = DjangoJSONEncoder()
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.value)
+            return f'{marker}{len(fragments) - 1}'
+        return encoder.default(value)
+
+    content = orjson.dumps(data, default=default, option=OPTIONS)
+    if not fragments:
+        return content
+    return re.sub(f'"{marker}(\\d+)"'.encode(), lambda match: fragments[int(match.group(1))], content)
+
+
+class JsonResponse(HttpResponse):
+    """
+    Drop-in replacement of django.http.JsonResponse rendering with orjson
+    and supporting RawJSON values
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -178,6 +178,13 @@ AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL', 'https://storage.yan
 AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', 'xside')
 AWS_S3_ACCESS_KEY_ID = os.environ.get('AWS_S3_ACCESS_KEY_ID', 'sQu2CtP5NrfZ8QV6_dNv')
 AWS_S3_SECRET_ACCESS_KEY = os.environ.get('AWS_S3_SECRET_ACCESS_KEY')
+# Seconds presigned URLs of stored files are valid
+AWS_QUERYSTRING_EXPIRE = int(os.environ.get('AWS_QUERYSTRING_EXPIRE', 3600))
+
+# Base URL of a CDN serving the storage bucket: item files get stable CDN URLs instead of presigned ones
+MEDIA_CDN_URL = os.environ.get('MEDIA_CDN_URL', '')
+# Presigned URLs are cached until this many seconds before they expire
+MEDIA_URL_EXPIRY_MARGIN = int(os.environ.get('MEDIA_URL_EXPIRY_MARGIN', 300))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
@@ -186,6 +193,58 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DEFAULT_SRID = 32637
 
+# Log ingestion: in-process cache of item file paths
+ITEM_FILE_CACHE_SIZE = int(os.getenv('ITEM_FILE_CACHE_SIZE', 1024))
+ITEM_FILE_CACHE_TIMEOUT = int(os.getenv('ITEM_FILE_CACHE_TIMEOUT', 300))
+
+# Asynchronous log ingestion: the incoming view spools logs to files
+# and `manage.py drain_log_spool` writes them into the database
+LOG_INGESTION_ASYNC = os.getenv('LOG_INGESTION_ASYNC', 'false').lower() == 'true'
+LOG_SPOOL_DIR = os.getenv('LOG_SPOOL_DIR', os.path.join(BASE_DIR, 'spool'))
+
+# Logs older than LOG_RETENTION_DAYS are moved by `manage.py archive_logs`
+# to LOG_ARCHIVE_PREFIX on the default storage
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 365))
+LOG_ARCHIVE_PREFIX = os.getenv('LOG_ARCHIVE_PREFIX', 'archive/logs')
+
+# Seconds between reloads of the daily spend of items from DailySpend
+SPEND_TRACKER_REFRESH = int(os.getenv('SPEND_TRACKER_REFRESH', 60))
+
+# Seconds between rebuilds of the in-process index of active items used by the decision endpoint
+AD_INDEX_TIMEOUT = int(os.getenv('AD_INDEX_TIMEOUT', 300))
+# Grid cell size of the index, in degrees, and maximum number of cells per item before falling back to bounding boxes
+AD_GRID_CELL_SIZE = float(os.getenv('AD_GRID_CELL_SIZE', 0.01))
+AD_GRID_MAX_CELLS = int(os.getenv('AD_GRID_MAX_CELLS', 10000))
+
+# Seconds to keep simplified item areas in the cache
+AREAS_CACHE_TIMEOUT = int(os.getenv('AREAS_CACHE_TIMEOUT', 86400))
+# Seconds to keep rendered vector tiles of items areas in the cache,
+# changes of items drop the tiles of all processes through the generation kept in the database
+TILE_CACHE_TIMEOUT = int(os.getenv('TILE_CACHE_TIMEOUT', 3600))
+
+# Chunked uploads of item files: chunk size (S3 requires at least 5 MiB), maximum file size,
+# directory for chunks on non-S3 storages and hours to keep unfinished uploads
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+UPLOAD_STAGING_DIR = os.getenv('UPLOAD_STAGING_DIR', os.path.join(BASE_DIR, 'uploads'))
+UPLOAD_SESSION_TIMEOUT = int(os.getenv('UPLOAD_SESSION_TIMEOUT', 24))
+
+# Uploaded files are hashed as they are received
+FILE_UPLOAD_HANDLERS = [
+    'client_space.upload_handlers.HashingMemoryFileUploadHandler',
+    'client_space.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Media processing of item files by `manage.py process_media`: number of files processed at once,
+# thumbnail size, size of screen renditions, ffmpeg binaries and seconds to wait for them
+MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 2))
+MEDIA_THUMBNAIL_SIZE = int(os.getenv('MEDIA_THUMBNAIL_SIZE', 320))
+MEDIA_RENDITION_WIDTH = int(os.getenv('MEDIA_RENDITION_WIDTH', 1280))
+MEDIA_RENDITION_HEIGHT = int(os.getenv('MEDIA_RENDITION_HEIGHT', 720))
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+MEDIA_PROCESSING_TIMEOUT = int(os.getenv('MEDIA_PROCESSING_TIMEOUT', 600))
+
 # Front end configuration
 FRONTEND_BASE_URL = 'http://localhost:3000'
 